@@ -3,4 +3,9 @@ import multiprocessing
 
 with contextlib.suppress(RuntimeError):
     # for child process context is set by parent
-    multiprocessing.set_start_method(method="spawn")
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        # fork server imports heavy modules once and forks workers from itself rather than importing them in each
+        multiprocessing.set_start_method(method="forkserver")
+        multiprocessing.set_forkserver_preload(["numpy", "cantera", "hkreduce.cpp_interface", "hkreduce.algorithms"])
+    else:
+        multiprocessing.set_start_method(method="spawn")
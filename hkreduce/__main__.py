@@ -107,6 +107,12 @@ def run(**kwargs: Any) -> None:
 
 @gen_options
 def main(**kwargs: Any) -> None:
+    # every worker is one process on its own core, so native libraries must not start thread pools in each of them.
+    # Set before fork server is started and imports numpy. Workers inherit environment of the program
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    os.environ.setdefault("OPENBLAS_NUM_THREADS", "1")
+    os.environ.setdefault("MKL_NUM_THREADS", "1")
+
     kwargs = {name: value for name, value in kwargs.items() if value is not None}
     setup_logging_config(verbose=kwargs["verbose"], colorized_logs=not kwargs["no_colorized_logs"])
     logger.info("Start program")
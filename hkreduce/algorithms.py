@@ -1,5 +1,8 @@
 # ruff: noqa: N806
 
+import functools
+from typing import NamedTuple
+
 import numpy as np
 from cantera import Solution  # type: ignore[import-untyped]
 from loguru import logger
@@ -7,7 +10,37 @@ from numpy.typing import NDArray
 
 from .cpp_interface import CSRAdjacencyMatrix
 from .typing import PathLike
-from .utils import NumpyArrayDumper, create_unique_file
+from .utils import MODELS_CACHE_SIZE, NumpyArrayDumper, create_unique_file
+
+
+class Stoichiometry(NamedTuple):
+    # reactant minus product coefficients
+    net_stoich: NDArray[np.float64]
+    # whether specy takes part in reaction, transposed and as float to be right operand of matmul
+    flags_transposed: NDArray[np.float64]
+
+
+@functools.lru_cache(maxsize=MODELS_CACHE_SIZE)
+def get_stoichiometry(st: Solution) -> Stoichiometry:
+    # stoich coefs depend only on model, not on its state, so they are computed once per model
+    product_stoich_coeffs = st.product_stoich_coeffs
+    reactant_stoich_coeffs = st.reactant_stoich_coeffs
+    stoichiometry = Stoichiometry(
+        net_stoich=reactant_stoich_coeffs - product_stoich_coeffs,
+        flags_transposed=np.ascontiguousarray(
+            ((product_stoich_coeffs != 0) | (reactant_stoich_coeffs != 0)).T, dtype=np.float64
+        ),
+    )
+    stoichiometry.net_stoich.flags.writeable = False
+    stoichiometry.flags_transposed.flags.writeable = False
+    return stoichiometry
+
+
+@functools.lru_cache(maxsize=MODELS_CACHE_SIZE)
+def get_rates_buffers(st: Solution) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+    # rates of every specy in every reaction are overwritten for each state, so buffers are allocated once per model
+    shape = (st.n_species, st.n_reactions)
+    return np.empty(shape, dtype=np.float64), np.empty(shape, dtype=np.float64)
 
 
 def create_matrix_for_drg(  # type: ignore[return] # noqa: C901
@@ -22,6 +55,8 @@ def create_matrix_for_drg(  # type: ignore[return] # noqa: C901
     state_idx: int,
 ) -> CSRAdjacencyMatrix:
     st.TPY = (temperature, pressure, mass_fractions)
+    # property computes rates in cantera and copies them on every access
+    net_rates_of_progress = st.net_rates_of_progress
 
     if save:
         logger.trace(
@@ -35,7 +70,7 @@ def create_matrix_for_drg(  # type: ignore[return] # noqa: C901
                 suffix=".npy",
             ).name,
         ).open("w") as saver:
-            saver.write_data(st.net_rates_of_progress)
+            saver.write_data(net_rates_of_progress)
 
         logger.trace(
             "Save matrix for {state_idx} state of {ai_cond_idx} case", state_idx=state_idx, ai_cond_idx=ai_cond_idx
@@ -47,9 +82,6 @@ def create_matrix_for_drg(  # type: ignore[return] # noqa: C901
             ).name,
         ).open("w")
 
-    # only consider contributions from reactions with nonzero net rates of progress
-    valid_reactions = np.where(st.net_rates_of_progress != 0)[0]
-
     try:
         csr_matrix = CSRAdjacencyMatrix(st.n_species)
     except Exception as error:
@@ -57,26 +89,20 @@ def create_matrix_for_drg(  # type: ignore[return] # noqa: C901
             saver.close()
         raise RuntimeError("Exception from c++ layer") from error
 
-    if valid_reactions.size:
-        product_stoich_coeffs = st.product_stoich_coeffs[:, valid_reactions]
-        reactant_stoich_coeffs = st.reactant_stoich_coeffs[:, valid_reactions]
-        net_stoich = reactant_stoich_coeffs - product_stoich_coeffs
-
-        flags = (product_stoich_coeffs != 0) | (reactant_stoich_coeffs != 0)
-
-        del product_stoich_coeffs, reactant_stoich_coeffs
+    if net_rates_of_progress.any():
+        stoichiometry = get_stoichiometry(st)
+        base_rates, __ = get_rates_buffers(st)
 
-        base_rates = np.abs(net_stoich * st.net_rates_of_progress[valid_reactions])
-
-        del valid_reactions, net_stoich
+        # reactions with zero net rates give zero rates so they add nothing to sums below
+        np.multiply(stoichiometry.net_stoich, net_rates_of_progress, out=base_rates)
+        np.abs(base_rates, out=base_rates)
 
         denominator = np.sum(base_rates, axis=1)[:, np.newaxis]
 
-        numerator = np.empty((st.n_species, st.n_species), dtype=np.float64)
-        for specy_b in range(st.n_species):
-            numerator[:, specy_b] = np.sum(base_rates[:, np.where(flags[specy_b])[0]], axis=1)
+        # sum of rates of A over reactions with B for all pairs at once
+        numerator = base_rates @ stoichiometry.flags_transposed
 
-        del base_rates, flags
+        del base_rates, stoichiometry
 
         # May get divide by zero if an inert species is present, and denominator
         # entry is zero.
@@ -126,6 +152,8 @@ def create_matrix_for_drgep(  # type: ignore[return] # noqa: C901
     state_idx: int,
 ) -> CSRAdjacencyMatrix:
     st.TPY = (temperature, pressure, mass_fractions)
+    # property computes rates in cantera and copies them on every access
+    net_rates_of_progress = st.net_rates_of_progress
 
     if save:
         logger.trace(
@@ -139,7 +167,7 @@ def create_matrix_for_drgep(  # type: ignore[return] # noqa: C901
                 suffix=".npy",
             ).name,
         ).open("w") as saver:
-            saver.write_data(st.net_rates_of_progress)
+            saver.write_data(net_rates_of_progress)
 
         logger.trace(
             "Save matrix for {state_idx} state of {ai_cond_idx} case", state_idx=state_idx, ai_cond_idx=ai_cond_idx
@@ -151,8 +179,6 @@ def create_matrix_for_drgep(  # type: ignore[return] # noqa: C901
             ).name,
         ).open("w")
 
-    valid_reactions = np.where(st.net_rates_of_progress != 0)[0]
-
     try:
         csr_matrix = CSRAdjacencyMatrix(st.n_species)
     except Exception as error:
@@ -160,30 +186,25 @@ def create_matrix_for_drgep(  # type: ignore[return] # noqa: C901
             saver.close()
         raise RuntimeError("Exception from c++ layer") from error
 
-    if valid_reactions.size:
-        product_stoich_coeffs = st.product_stoich_coeffs[:, valid_reactions]
-        reactant_stoich_coeffs = st.reactant_stoich_coeffs[:, valid_reactions]
-        net_stoich = reactant_stoich_coeffs - product_stoich_coeffs
-
-        flags = (product_stoich_coeffs != 0) | (reactant_stoich_coeffs != 0)
-
-        del product_stoich_coeffs, reactant_stoich_coeffs
-
-        base_rates = net_stoich * st.net_rates_of_progress[valid_reactions]
+    if net_rates_of_progress.any():
+        stoichiometry = get_stoichiometry(st)
+        base_rates, __ = get_rates_buffers(st)
 
-        del valid_reactions, net_stoich
+        # reactions with zero net rates give zero rates so they add nothing to sums below
+        np.multiply(stoichiometry.net_stoich, net_rates_of_progress, out=base_rates)
 
-        denominator_dest = np.sum(np.minimum(0.0, base_rates), axis=1) * (-1)
-        denominator_prod = np.sum(np.maximum(0.0, base_rates), axis=1)
-        denominator = np.maximum(denominator_prod, denominator_dest)[:, np.newaxis]
-        del denominator_dest, denominator_prod
+        # signed sum of rates of A over reactions with B for all pairs at once
+        numerator = base_rates @ stoichiometry.flags_transposed
+        np.abs(numerator, out=numerator)
 
-        numerator = np.empty((st.n_species, st.n_species), dtype=np.float64)
-        for specy_b in range(st.n_species):
-            numerator[:, specy_b] = np.sum(base_rates[:, np.where(flags[specy_b])[0]], axis=1)
-        numerator = np.abs(numerator)
+        # max(prod, dest) == (prod + dest + |prod - dest|) / 2, so clipped copies of base rates are not needed
+        denominator = np.abs(base_rates.sum(axis=1))
+        np.abs(base_rates, out=base_rates)
+        denominator += base_rates.sum(axis=1)
+        denominator *= 0.5
+        denominator = denominator[:, np.newaxis]
 
-        del base_rates, flags
+        del base_rates, stoichiometry
 
         # May get divide by zero if an inert species is present, and denominator
         # entry is zero.
@@ -233,6 +254,8 @@ def create_matrix_for_pfa(  # type: ignore[return] # noqa: C901
     state_idx: int,
 ) -> CSRAdjacencyMatrix:
     st.TPX = (temperature, pressure, mass_fractions)
+    # property computes rates in cantera and copies them on every access
+    net_rates_of_progress = st.net_rates_of_progress
 
     if save:
         logger.trace(
@@ -246,7 +269,7 @@ def create_matrix_for_pfa(  # type: ignore[return] # noqa: C901
                 suffix=".npy",
             ).name,
         ).open("w") as saver:
-            saver.write_data(st.net_rates_of_progress)
+            saver.write_data(net_rates_of_progress)
 
         logger.trace(
             "Save matrix for {state_idx} state of {ai_cond_idx} case", state_idx=state_idx, ai_cond_idx=ai_cond_idx
@@ -265,32 +288,23 @@ def create_matrix_for_pfa(  # type: ignore[return] # noqa: C901
             saver.close()
         raise RuntimeError("Exception from c++ layer") from error
 
-    valid_reactions = np.where(st.net_rates_of_progress != 0)[0]
-
-    if valid_reactions.size:
-        product_stoich_coeffs = st.product_stoich_coeffs[:, valid_reactions]
-        reactant_stoich_coeffs = st.reactant_stoich_coeffs[:, valid_reactions]
-        net_stoich = reactant_stoich_coeffs - product_stoich_coeffs
-
-        flags = (product_stoich_coeffs != 0) | (reactant_stoich_coeffs != 0)
-
-        del product_stoich_coeffs, reactant_stoich_coeffs
-
-        base_rates = np.array(net_stoich * st.net_rates_of_progress[valid_reactions])
+    if net_rates_of_progress.any():
+        stoichiometry = get_stoichiometry(st)
+        production_rates, consumption_rates = get_rates_buffers(st)
 
-        del net_stoich
+        # reactions with zero net rates give zero rates so they add nothing to sums below
+        np.multiply(stoichiometry.net_stoich, net_rates_of_progress, out=production_rates)
+        np.minimum(production_rates, 0.0, out=consumption_rates)
+        np.negative(consumption_rates, out=consumption_rates)
+        np.maximum(production_rates, 0.0, out=production_rates)
 
-        production_A = np.sum(np.maximum(base_rates, 0), axis=1)
-        consumption_A = -1 * np.sum(np.minimum(base_rates, 0), axis=1)
-        production_AB = np.empty((st.n_species, st.n_species), dtype=np.float64)
-        consumption_AB = np.empty((st.n_species, st.n_species), dtype=np.float64)
-        for specy_b in range(st.n_species):
-            production_AB[:, specy_b] = np.sum(np.maximum(base_rates[:, np.where(flags[specy_b])[0]], 0.0), axis=1)
-            consumption_AB[:, specy_b] = -1 * np.sum(
-                np.minimum(base_rates[:, np.where(flags[specy_b])[0]], 0.0), axis=1
-            )
+        production_A = np.sum(production_rates, axis=1)
+        consumption_A = np.sum(consumption_rates, axis=1)
+        # rates of A over reactions with B for all pairs at once
+        production_AB = production_rates @ stoichiometry.flags_transposed
+        consumption_AB = consumption_rates @ stoichiometry.flags_transposed
 
-        del base_rates
+        del production_rates, consumption_rates, stoichiometry
 
         # May get divide by zero if an inert species is present, and denominator
         # entry is zero.
@@ -305,28 +319,11 @@ def create_matrix_for_pfa(  # type: ignore[return] # noqa: C901
 
         del production_AB, consumption_AB, denominator
 
-        r_pro_AB2: NDArray[np.float64] | None = None
-        r_con_AB2: NDArray[np.float64] | None = None
-
-        for specy_m in range(st.n_species):
-            pro1 = r_pro_AB1[:, specy_m]
-            pro2 = r_pro_AB1[specy_m, :]
-            con1 = r_con_AB1[:, specy_m]
-            con2 = r_con_AB1[specy_m, :]
-            pro1[specy_m] = 0
-            pro2[specy_m] = 0
-            con1[specy_m] = 0
-            con2[specy_m] = 0
-            if r_pro_AB2 is None:
-                r_pro_AB2 = np.outer(pro1, pro2)
-            else:
-                r_pro_AB2 += np.outer(pro1, pro2)
-            if r_con_AB2 is None:
-                r_con_AB2 = np.outer(con1, con2)
-            else:
-                r_con_AB2 += np.outer(con1, con2)
-
-        del pro1, pro2, con1, con2
+        # paths through any third specy M, self paths A -> A and B -> B are excluded
+        np.fill_diagonal(r_pro_AB1, 0.0)
+        np.fill_diagonal(r_con_AB1, 0.0)
+        r_pro_AB2 = r_pro_AB1 @ r_pro_AB1
+        r_con_AB2 = r_con_AB1 @ r_con_AB1
 
         adjacency_matrix = r_pro_AB1 + r_con_AB1 + r_pro_AB2 + r_con_AB2
 
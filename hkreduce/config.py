@@ -179,6 +179,15 @@ Default value equals --num-threads flag",
 
     no_colorized_logs: Annotated[bool, Field(default=False, description="Disable colorized output")]
 
+    pin_workers_to_cpus: Annotated[
+        bool,
+        Field(
+            default=False,
+            description="Pin every worker process to its own allowed cpu core. Use it only if nothing else runs on \
+these cores, otherwise workers of several runs share same cores while others are idle",
+        ),
+    ]
+
     _reducing_task_config: ReducingTaskConfig | None = None
     _tmp_dir: PathLike | None = None
 
@@ -1,5 +1,6 @@
 #define PY_SSIZE_T_CLEAN
 
+#include <cmath>
 #include <cstring>
 
 #include "Python.h"
@@ -242,25 +243,64 @@ static PyObject* CSRAdjacencyMatrixObject_finalize(CSRAdjacencyMatrixObject* sel
     return Py_None;
 };
 
-static PyObject* CSRAdjacencyMatrixObject_run_reducing(CSRAdjacencyMatrixObject* self, PyObject* args) {
-    const char* method;
-    double threshold;
-    PyArrayObject* sourcesNumpyArray = NULL;
-
-    if (!PyArg_ParseTuple(args, "sdO:run_reducing", &method, &threshold, &sourcesNumpyArray)) {
-        return NULL;
-    }
-
+static int checkSourcesArray(PyArrayObject* sourcesNumpyArray, size_t matrixSize) {
     if (!PyObject_IsInstance((PyObject*) sourcesNumpyArray, (PyObject*) &PyArray_Type)) {
         PyErr_SetString(PyExc_TypeError, "An array object of the \"numpy.ndarray\" type is expected");
-        return NULL;
+        return -1;
     }
     if (PyArray_NDIM(sourcesNumpyArray) != 1) {
         PyErr_SetString(PyExc_ValueError, "Count of the array's dimensions doesn't equal 1");
-        return NULL;
+        return -1;
     }
     if (PyArray_TYPE(sourcesNumpyArray) != NPY_UINTP) {
         PyErr_SetString(PyExc_TypeError, "The array's type doesn't equal double");
+        return -1;
+    }
+
+    size_t sourcesNumpyArraySize = (size_t) PyArray_DIM(sourcesNumpyArray, 0);
+    if (sourcesNumpyArraySize > matrixSize) {
+        PyErr_SetString(PyExc_ValueError, "The array's length is greater than matrix size");
+        return -1;
+    }
+    if (!(PyArray_FLAGS(sourcesNumpyArray) | NPY_C_CONTIGUOUS)) {
+        PyErr_SetString(PyExc_ValueError, "The array is not in C format of storing data");
+        return -1;
+    }
+    return 0;
+}
+
+static void readSources(PyArrayObject* sourcesNumpyArray, ArrayCollection<size_t>& sources) {
+    size_t sourcesNumpyArraySize = (size_t) PyArray_DIM(sourcesNumpyArray, 0);
+    for (size_t i = 0; i < sourcesNumpyArraySize; ++i) {
+        size_t* idx = (size_t*) PyArray_GETPTR1(sourcesNumpyArray, (npy_intp) i);
+        sources.append(*idx);
+    }
+}
+
+static Bitmap runReducingMethod(
+    CSRAdjacencyMatrix<double>& matrix,
+    const char* method,
+    ArrayCollection<size_t>& sources,
+    double threshold
+) {
+    if (strcmp(method, "DRG") == 0) {
+        DRG<double> drg;
+        return drg.run(matrix, sources, threshold, getDefaultAllocator());
+    }
+    if (strcmp(method, "DRGEP") == 0) {
+        DRGEP<double> drgep;
+        return drgep.run(matrix, sources, threshold, getDefaultAllocator());
+    }
+    PFA<double> pfa;
+    return pfa.run(matrix, sources, threshold, getDefaultAllocator());
+}
+
+static PyObject* CSRAdjacencyMatrixObject_run_reducing(CSRAdjacencyMatrixObject* self, PyObject* args) {
+    const char* method;
+    double threshold;
+    PyArrayObject* sourcesNumpyArray = NULL;
+
+    if (!PyArg_ParseTuple(args, "sdO:run_reducing", &method, &threshold, &sourcesNumpyArray)) {
         return NULL;
     }
 
@@ -269,52 +309,16 @@ static PyObject* CSRAdjacencyMatrixObject_run_reducing(CSRAdjacencyMatrixObject*
         return NULL;
     }
 
-    size_t sourcesNumpyArraySize = (size_t) PyArray_DIM(sourcesNumpyArray, 0);
-    if (sourcesNumpyArraySize > self->matrix->getSize()) {
-        PyErr_SetString(PyExc_ValueError, "The array's length is greater than matrix size");
-        return NULL;
-    }
-    if (!(PyArray_FLAGS(sourcesNumpyArray) | NPY_C_CONTIGUOUS)) {
-        PyErr_SetString(PyExc_ValueError, "The array is not in C format of storing data");
+    if (checkSourcesArray(sourcesNumpyArray, self->matrix->getSize()) < 0) {
         return NULL;
     }
 
     PyArrayObject* resultArray = NULL;
     try {
-        ArrayCollection<size_t> sources(sourcesNumpyArraySize, getDefaultAllocator());
-        for (size_t i = 0; i < sourcesNumpyArraySize; ++i) {
-            size_t* idx = (size_t*) PyArray_GETPTR1(sourcesNumpyArray, (npy_intp) i);
-            sources.append(*idx);
-        }
+        ArrayCollection<size_t> sources((size_t) PyArray_DIM(sourcesNumpyArray, 0), getDefaultAllocator());
+        readSources(sourcesNumpyArray, sources);
 
-        Bitmap resultBitmap;
-        if (strcmp(method, "DRG") == 0) {
-            DRG<double> drg;
-            resultBitmap = drg.run(
-                *(self->matrix),
-                sources,
-                threshold,
-                getDefaultAllocator()
-            );
-        }
-        else if (strcmp(method, "DRGEP") == 0) {
-            DRGEP<double> drgep;
-            resultBitmap = drgep.run(
-                *(self->matrix),
-                sources,
-                threshold,
-                getDefaultAllocator()
-            );
-        }
-        else {
-            PFA<double> pfa;
-            resultBitmap = pfa.run(
-                *(self->matrix),
-                sources,
-                threshold,
-                getDefaultAllocator()
-            );
-        }
+        Bitmap resultBitmap = runReducingMethod(*(self->matrix), method, sources, threshold);
 
         size_t resultArraySize = countBits(resultBitmap, true);
         const npy_intp dims[1] { (npy_intp) resultArraySize };
@@ -390,7 +394,173 @@ static PyTypeObject CSRAdjacencyMatrixType = {
     .tp_new = CSRAdjacencyMatrixObject_new,
 };
 
+static PyObject* cpp_interface_run_reducing_for_matrixes(PyObject* module, PyObject* args) {
+    PyObject* matrixesList = NULL;
+    const char* method;
+    double threshold;
+    PyArrayObject* sourcesNumpyArray = NULL;
+
+    if (!PyArg_ParseTuple(
+        args, "O!sdO:run_reducing_for_matrixes", &PyList_Type, &matrixesList, &method, &threshold, &sourcesNumpyArray
+    )) {
+        return NULL;
+    }
+
+    Py_ssize_t matrixesCount = PyList_GET_SIZE(matrixesList);
+    if (matrixesCount == 0) {
+        PyErr_SetString(PyExc_ValueError, "At least one matrix is expected");
+        return NULL;
+    }
+    size_t matrixSize = 0;
+    for (Py_ssize_t i = 0; i < matrixesCount; ++i) {
+        PyObject* item = PyList_GET_ITEM(matrixesList, i);
+        if (!PyObject_TypeCheck(item, &CSRAdjacencyMatrixType)) {
+            PyErr_SetString(PyExc_TypeError, "A list of \"CSRAdjacencyMatrix\" objects is expected");
+            return NULL;
+        }
+        CSRAdjacencyMatrixObject* matrixObject = (CSRAdjacencyMatrixObject*) item;
+        if (!matrixObject->finalized) {
+            PyErr_SetString(PyExc_ValueError, "Matrix is not finalized");
+            return NULL;
+        }
+        if (i == 0) {
+            matrixSize = matrixObject->matrix->getSize();
+        }
+        else if (matrixObject->matrix->getSize() != matrixSize) {
+            PyErr_SetString(PyExc_ValueError, "Matrixes have different sizes");
+            return NULL;
+        }
+    }
+
+    if (checkSourcesArray(sourcesNumpyArray, matrixSize) < 0) {
+        return NULL;
+    }
+
+    PyArrayObject* resultArray = NULL;
+    try {
+        ArrayCollection<size_t> sources((size_t) PyArray_DIM(sourcesNumpyArray, 0), getDefaultAllocator());
+        readSources(sourcesNumpyArray, sources);
+
+        const npy_intp dims[1] { (npy_intp) matrixSize };
+        resultArray = (PyArrayObject*) PyArray_ZEROS(1, dims, NPY_BOOL, 0);
+        if (resultArray == NULL) {
+            return NULL;
+        }
+        npy_bool* result = (npy_bool*) PyArray_DATA(resultArray);
+
+        // union of species retained by every matrix
+        for (Py_ssize_t i = 0; i < matrixesCount; ++i) {
+            CSRAdjacencyMatrixObject* matrixObject = (CSRAdjacencyMatrixObject*) PyList_GET_ITEM(matrixesList, i);
+            Bitmap resultBitmap = runReducingMethod(*(matrixObject->matrix), method, sources, threshold);
+            for (size_t j = 0; j < matrixSize; ++j) {
+                if (resultBitmap[j]) {
+                    result[j] = NPY_TRUE;
+                }
+            }
+        }
+    }
+    catch (const exception& error) {
+        PyErr_SetString(PyExc_RuntimeError, error.what());
+        Py_XDECREF(resultArray);
+        return NULL;
+    }
+    catch (...) {
+        PyErr_SetString(PyExc_RuntimeError, "Unknown error");
+        Py_XDECREF(resultArray);
+        return NULL;
+    }
+    return (PyObject*) resultArray;
+};
+
+static int checkStateArray(PyObject* stateObject, npy_intp size, bool writeable) {
+    if (!PyArray_Check(stateObject)) {
+        PyErr_SetString(PyExc_TypeError, "An array object of the \"numpy.ndarray\" type is expected");
+        return -1;
+    }
+    PyArrayObject* stateArray = (PyArrayObject*) stateObject;
+    if (PyArray_NDIM(stateArray) != 1) {
+        PyErr_SetString(PyExc_ValueError, "Count of the array's dimensions doesn't equal 1");
+        return -1;
+    }
+    if (PyArray_TYPE(stateArray) != NPY_DOUBLE) {
+        PyErr_SetString(PyExc_TypeError, "The array's type doesn't equal double");
+        return -1;
+    }
+    if (PyArray_DIM(stateArray, 0) != size) {
+        PyErr_SetString(PyExc_ValueError, "States have different sizes");
+        return -1;
+    }
+    if (!PyArray_IS_C_CONTIGUOUS(stateArray)) {
+        PyErr_SetString(PyExc_ValueError, "The array is not in C format of storing data");
+        return -1;
+    }
+    if (writeable && !PyArray_ISWRITEABLE(stateArray)) {
+        PyErr_SetString(PyExc_ValueError, "The array is not writeable");
+        return -1;
+    }
+    return 0;
+}
+
+static PyObject* cpp_interface_update_max_and_compute_residual(PyObject* module, PyObject* args) {
+    PyObject* currentStateObject = NULL;
+    PyObject* prevStateObject = NULL;
+    PyObject* maxStateObject = NULL;
+    double atol;
+
+    if (!PyArg_ParseTuple(
+        args, "OOOd:update_max_and_compute_residual", &currentStateObject, &prevStateObject, &maxStateObject, &atol
+    )) {
+        return NULL;
+    }
+
+    if (!PyArray_Check(currentStateObject) || PyArray_NDIM((PyArrayObject*) currentStateObject) != 1) {
+        PyErr_SetString(PyExc_TypeError, "One dimensional array of state is expected");
+        return NULL;
+    }
+    npy_intp size = PyArray_DIM((PyArrayObject*) currentStateObject, 0);
+    if (
+        checkStateArray(currentStateObject, size, false) < 0
+        || checkStateArray(prevStateObject, size, false) < 0
+        || checkStateArray(maxStateObject, size, true) < 0
+    ) {
+        return NULL;
+    }
+    if (size == 0) {
+        return PyFloat_FromDouble(0.0);
+    }
+
+    const double* currentState = (const double*) PyArray_DATA((PyArrayObject*) currentStateObject);
+    const double* prevState = (const double*) PyArray_DATA((PyArrayObject*) prevStateObject);
+    double* maxState = (double*) PyArray_DATA((PyArrayObject*) maxStateObject);
+
+    // running maximum is updated and residual is computed in one pass without temporaries
+    double sum = 0.0;
+    Py_BEGIN_ALLOW_THREADS
+    for (npy_intp i = 0; i < size; ++i) {
+        if (maxState[i] < currentState[i]) {
+            maxState[i] = currentState[i];
+        }
+        double diff = (currentState[i] - prevState[i]) / (maxState[i] + atol);
+        sum += diff * diff;
+    }
+    Py_END_ALLOW_THREADS
+
+    return PyFloat_FromDouble(sqrt(sum / (double) size));
+};
+
 static PyMethodDef cpp_interface_methods[] = {
+    {
+        "run_reducing_for_matrixes",
+        (PyCFunction) cpp_interface_run_reducing_for_matrixes,
+        METH_VARARGS,
+        "Run reducing for every matrix and return bitmap of species retained by any of them"
+    },
+    {
+        "update_max_and_compute_residual",
+        (PyCFunction) cpp_interface_update_max_and_compute_residual,
+        METH_VARARGS,
+        "Update running maximum of state in place and return residual between current and previous states"
+    },
     {NULL, NULL, 0, NULL}
 };
 
@@ -10,3 +10,16 @@ class CSRAdjacencyMatrix:
     def run_reducing(
         self, method: Literal["DRG", "DRGEP", "PFA"], threshold: float, sources: NDArray[np.uintp]
     ) -> NDArray[np.uintp]: ...
+
+def run_reducing_for_matrixes(
+    matrixes: list[CSRAdjacencyMatrix],
+    method: Literal["DRG", "DRGEP", "PFA"],
+    threshold: float,
+    sources: NDArray[np.uintp],
+) -> NDArray[np.bool_]: ...
+def update_max_and_compute_residual(
+    current_state: NDArray[np.float64],
+    prev_state: NDArray[np.float64],
+    max_state: NDArray[np.float64],
+    atol: float,
+) -> float: ...
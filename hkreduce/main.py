@@ -1,16 +1,20 @@
 import shutil
 import time
-from typing import Any
+from itertools import chain
+from typing import Any, Iterator
 
+import numpy as np
 from cantera import Solution
 from loguru import logger  # type: ignore[import-untyped]
+from numpy.typing import NDArray
 
 from .config import Config
 from .errors import AutoretrievingInitialThresholdError, ReducingError, SimulationError, ThresholdError
 from .reducing import ReducersManager
 from .simulation import SimulationManager
 from .typing import PathLike
-from .utils import create_unique_file
+
+DEFAULT_THRESHOLDS_BATCH_SIZE = 8
 
 
 class Main:
@@ -23,17 +27,83 @@ class Main:
         self.config = config
         self.logger = logger
 
+        self._reactions_species = self._index_reactions_species()
+        self._reactions_colliders = self._index_reactions_colliders()
+        self._species_names = np.array(self.model.species_names, dtype=np.object_)
+        self._third_bodies_efficiencies = self._index_third_bodies_efficiencies()
+
+        # reduced models by retained species. Close thresholds often give the same species set
+        self._reduced_models: dict[frozenset[int], tuple[PathLike, int]] = {}
+        # errors by reduced model path. Path is unique for retained species set due to cache above
+        self._errors: dict[PathLike, float] = {}
+
+    def _index_reactions_species(self) -> tuple[NDArray[np.intp], NDArray[np.intp]]:
+        # flat pairs (reaction index, specy index) for every reactant and product of every reaction
+        reactions_idxs: list[int] = []
+        species_idxs: list[int] = []
+        for reaction_idx, reaction in enumerate(self.model.reactions()):
+            for specy_name in chain(reaction.reactants, reaction.products):
+                reactions_idxs.append(reaction_idx)
+                species_idxs.append(self.model.species_index(specy_name))
+        return np.array(reactions_idxs, dtype=np.intp), np.array(species_idxs, dtype=np.intp)
+
+    def _index_reactions_colliders(self) -> tuple[NDArray[np.intp], NDArray[np.intp]]:
+        # pairs (reaction index, specy index) for third body reactions with zero default efficiency and the only
+        # collider. Such reaction is removed if its collider is removed
+        reactions_idxs: list[int] = []
+        species_idxs: list[int] = []
+        for reaction_idx, reaction in enumerate(self.model.reactions()):
+            third_body = reaction.third_body
+            if not third_body or getattr(third_body, "default_efficiency", 1.0) or len(third_body.efficiencies) != 1:
+                continue
+            reactions_idxs.append(reaction_idx)
+            species_idxs.append(self.model.species_index(next(iter(third_body.efficiencies))))
+        return np.array(reactions_idxs, dtype=np.intp), np.array(species_idxs, dtype=np.intp)
+
+    def _index_third_bodies_efficiencies(self) -> dict[int, tuple[NDArray[np.intp], NDArray[np.float64]]]:
+        # species indexes and efficiencies of third body of every reaction having it
+        third_bodies_efficiencies: dict[int, tuple[NDArray[np.intp], NDArray[np.float64]]] = {}
+        for reaction_idx, reaction in enumerate(self.model.reactions()):
+            third_body = reaction.third_body
+            if not third_body:
+                continue
+            efficiencies = third_body.efficiencies
+            third_bodies_efficiencies[reaction_idx] = (
+                np.fromiter(
+                    (self.model.species_index(specy_name) for specy_name in efficiencies),
+                    dtype=np.intp,
+                    count=len(efficiencies),
+                ),
+                np.fromiter(efficiencies.values(), dtype=np.float64, count=len(efficiencies)),
+            )
+        return third_bodies_efficiencies
+
+    def _reduced_model_reactions_filter(self, removed_species_mask: NDArray[np.bool_]) -> NDArray[np.bool_]:
+        reactions_idxs, species_idxs = self._reactions_species
+        # reaction is kept if none of its reactants and products is removed
+        removed_species_count = np.bincount(
+            reactions_idxs[removed_species_mask[species_idxs]], minlength=self.model.n_reactions
+        )
+        reactions_mask = removed_species_count == 0
+
+        colliders_reactions_idxs, colliders_idxs = self._reactions_colliders
+        reactions_mask[colliders_reactions_idxs] &= ~removed_species_mask[colliders_idxs]
+        return reactions_mask
+
     def _retrieve_initial_threshold(
-        self, reducers_manager: ReducersManager, original_ignition_delays: list[float]
+        self, reducers_manager: ReducersManager, original_ignition_delays: NDArray[np.float64]
     ) -> tuple[float, PathLike, set[int], int, float]:
-        for i in range(self.config.reducing_task_config.initial_threshold_auto_retrieving_attempts):
-            threshold = self.config.reducing_task_config.initial_threshold * (
-                self.config.reducing_task_config.initial_threshold_auto_retrieving_multiplier**i
-            )
+        thresholds = [
+            self.config.reducing_task_config.initial_threshold
+            * (self.config.reducing_task_config.initial_threshold_auto_retrieving_multiplier**i)
+            for i in range(self.config.reducing_task_config.initial_threshold_auto_retrieving_attempts)
+        ]
+        self.logger.info("Reduce model with thresholds: {thresholds}", thresholds=thresholds)
+        retained_species_batch = reducers_manager.reduce_batch(thresholds)
+
+        for threshold, retained_species in zip(thresholds, retained_species_batch, strict=True):
             self.logger.debug("Attempt {threshold} as initial threshold", threshold=threshold)
 
-            self.logger.info("Reduce model with threshold: {threshold}", threshold=threshold)
-            retained_species = reducers_manager.reduce(threshold)
             if len(retained_species) == self.model.n_species:
                 self.logger.info(
                     "Reducing model process doesn't reduce model with threshold: {threshold}", threshold=threshold
@@ -51,8 +121,7 @@ class Main:
                 threshold=threshold,
             )
 
-            model, model_path = self._create_reduced_model(retained_species)
-            reactions_count = len(model.reactions())
+            model_path, reactions_count = self._create_reduced_model(retained_species)
             self.logger.info(
                 "Created reduced model with {retained_species_len} species: `{model_path}`",
                 retained_species_len=len(retained_species),
@@ -82,40 +151,71 @@ provided error limit"
 provided error limit"
         )
 
-    def _create_reduced_model(self, retained_species: set[int]) -> tuple[Solution, PathLike]:
-        removed_species = set(range(self.model.n_species))
-        removed_species = removed_species.difference(retained_species)
+    def _reduce_sweep(
+        self, reducers_manager: ReducersManager, initial_threshold: float, threshold_increment: float
+    ) -> Iterator[tuple[float, set[int]]]:
+        # reduce thresholds by batches to pay for one round-trip to reducers per batch rather than per threshold.
+        # Step from initial threshold is doubled every time
+        step_idx = 0
+        while True:
+            thresholds = [
+                initial_threshold + threshold_increment * 2 ** (step_idx + i)
+                for i in range(DEFAULT_THRESHOLDS_BATCH_SIZE)
+            ]
+            self.logger.info("Reduce model with thresholds: {thresholds}", thresholds=thresholds)
+            yield from zip(thresholds, reducers_manager.reduce_batch(thresholds), strict=True)
+            step_idx += DEFAULT_THRESHOLDS_BATCH_SIZE
+
+    def _removed_species_mask(self, retained_species: set[int]) -> NDArray[np.bool_]:
+        removed_species_mask = np.ones(self.model.n_species, dtype=np.bool_)
+        removed_species_mask[list(retained_species)] = False
+        return removed_species_mask
+
+    def _compute_retained_reactions_mask(
+        self, removed_species_mask: NDArray[np.bool_]
+    ) -> tuple[NDArray[np.bool_], int]:
+        reactions_mask = self._reduced_model_reactions_filter(removed_species_mask)
+        return reactions_mask, int(np.count_nonzero(reactions_mask))
+
+    def _create_reduced_model(self, retained_species: set[int]) -> tuple[PathLike, int]:
+        key = frozenset(retained_species)
+        if key in self._reduced_models:
+            self.logger.debug("Reuse already created reduced model with the same species")
+            return self._reduced_models[key]
+
+        removed_species_mask = self._removed_species_mask(retained_species)
+        reactions_mask, reactions_count = self._compute_retained_reactions_mask(removed_species_mask)
+        model_path = self._materialize_model(removed_species_mask, reactions_mask)
+        self._reduced_models[key] = model_path, reactions_count
+        return model_path, reactions_count
+
+    def _materialize_model(
+        self, removed_species_mask: NDArray[np.bool_], reactions_mask: NDArray[np.bool_]
+    ) -> PathLike:
         model_species = self.model.species()
-        removed_species_names = {model_species[removed_specy].name for removed_specy in removed_species}
 
         # TODO: read reactions from file rather than model. Because it is not known reaction modifying has effect or not
 
+        model_reactions = self.model.reactions()
         reactions_of_reduced_model: list[Any] = []
-        for reaction in self.model.reactions():
-            if any(product_name in removed_species_names for product_name in reaction.products):
-                continue
-
-            if any(reactant_name in removed_species_names for reactant_name in reaction.reactants):
-                continue
-
-            third_body = reaction.third_body
-            if (
-                third_body
-                and not getattr(third_body, "default_efficiency", 1.0)
-                and len(third_body.efficiencies) == 1
-                and list(third_body.efficiencies.keys())[0] in removed_species_names
-            ):
-                continue
-
-            if third_body:
-                third_body.efficiencies = {
-                    sp: val for sp, val in third_body.efficiencies.items() if sp not in removed_species_names
-                }
+        for reaction_idx in np.flatnonzero(reactions_mask):
+            reaction = model_reactions[reaction_idx]
+
+            if reaction_idx in self._third_bodies_efficiencies:
+                species_idxs, efficiencies = self._third_bodies_efficiencies[reaction_idx]
+                retained_mask = ~removed_species_mask[species_idxs]
+                reaction.third_body.efficiencies = dict(
+                    zip(
+                        self._species_names[species_idxs[retained_mask]].tolist(),
+                        efficiencies[retained_mask].tolist(),
+                        strict=True,
+                    )
+                )
 
             reactions_of_reduced_model.append(reaction)
 
         species_of_reduced_model: list[Any] = [
-            specy for specy in self.model.species() if specy.name not in removed_species_names
+            model_species[specy_idx] for specy_idx in np.flatnonzero(~removed_species_mask)
         ]
 
         model = Solution(
@@ -124,16 +224,60 @@ provided error limit"
             thermo="IdealGas",
             kinetics="GasKinetics",
         )
-        model_filename = create_unique_file(
-            dir=self.config.tmp_dir,
-            prefix=f"reduced_model_with_{len(species_of_reduced_model)}_species_",
-            suffix=".yaml",
+        # tmp dir is unique for run and every reduced model is created once, so count of them makes name unique
+        model_filename = (
+            self.config.tmp_dir
+            / f"reduced_model_{len(self._reduced_models)}_with_{len(species_of_reduced_model)}_species.yaml"
         )
         model.write_yaml(filename=model_filename)
 
-        return model, model_filename
+        return model_filename
+
+    def _try_reduced_model(
+        self, threshold: float, retained_species: set[int], original_ignition_delays: NDArray[np.float64]
+    ) -> tuple[PathLike, int, float]:
+        self.logger.info(
+            "Model reduced with {retained_species_count} species and threshold {threshold}",
+            retained_species_count=len(retained_species),
+            threshold=threshold,
+        )
+
+        model_path, retained_reactions_count = self._create_reduced_model(retained_species)
+        self.logger.info(
+            "Created reduced model with {retained_species_count} species and \
+{retained_reactions_count} reactions: `{model_path}`",
+            retained_species_count=len(retained_species),
+            retained_reactions_count=retained_reactions_count,
+            model_path=model_path,
+        )
+
+        self.logger.info("Calculating error")
+        error = self._calc_error(model_path, original_ignition_delays)
+        if error > self.config.reducing_task_config.max_error:
+            self.logger.info(
+                "Reduced model with {retained_species_count} species and {retained_reactions_count} \
+reactions at `{model_path}` gives too large error: {error}",
+                retained_species_count=len(retained_species),
+                retained_reactions_count=retained_reactions_count,
+                model_path=model_path,
+                error=error * 100,
+            )
+        else:
+            self.logger.info(
+                "Reduced model with {retained_species_count} species and {retained_reactions_count} \
+at `{model_path}` gives error: {error}",
+                retained_species_count=len(retained_species),
+                retained_reactions_count=retained_reactions_count,
+                model_path=model_path,
+                error=error * 100,
+            )
+        return model_path, retained_reactions_count, error
+
+    def _calc_error(self, model_path: PathLike, original_ignition_delays: NDArray[np.float64]) -> float:
+        if model_path in self._errors:
+            self.logger.debug("Reuse already calculated error of `{model_path}`", model_path=model_path)
+            return self._errors[model_path]
 
-    def _calc_error(self, model_path: PathLike, original_ignition_delays: list[float]) -> float:
         try:
             __, ignition_delays = SimulationManager(
                 config=self.config,
@@ -141,27 +285,26 @@ provided error limit"
                 only_ignition_delays=True,
             ).run()
         except SimulationError:
+            self._errors[model_path] = 1
             return 1
 
-        max_error: float = 0.0
-        for i in range(len(original_ignition_delays)):
-            error = min(abs(1 - ignition_delays[i] / original_ignition_delays[i]), 1)
-            if max_error < error:
-                max_error = error
-        return max_error
+        errors = np.minimum(np.abs(1 - np.asarray(ignition_delays, dtype=np.float64) / original_ignition_delays), 1)
+        self._errors[model_path] = float(errors.max(initial=0.0))
+        return self._errors[model_path]
 
-    def run(self) -> None:
+    def run(self) -> None:  # noqa: C901
         start = time.time()
 
         self.logger.info("Start simulations to retrieve samples")
-        samples_savers, original_ignition_delays = SimulationManager(
+        samples, ignition_delays = SimulationManager(
             model_path=self.config.reducing_task_config.model,
             config=self.config,
             only_ignition_delays=False,
         ).run()
+        original_ignition_delays = np.asarray(ignition_delays, dtype=np.float64)
         self.logger.info("Simulations are finished. Samples is got")
 
-        with ReducersManager(config=self.config, samples_savers=samples_savers) as reducers_manager:
+        with ReducersManager(config=self.config, samples=samples) as reducers_manager:
             initial_threshold = self.config.reducing_task_config.initial_threshold
 
             if not self.config.reducing_task_config._initial_threshold_set_by_user:  # noqa: SLF001
@@ -184,8 +327,7 @@ provided error limit"
                     )
                     raise ThresholdError("Model doesn't reduced with user provided threshold: {threshold}")
 
-                model, model_path = self._create_reduced_model(retained_species)
-                retained_reactions_count = len(model.reactions())
+                model_path, retained_reactions_count = self._create_reduced_model(retained_species)
                 self.logger.info(
                     "Created reduced model with {retained_species_count} species: `{model_path}`",
                     retained_species_count=len(retained_species),
@@ -206,67 +348,68 @@ reactions at `{model_path}` gives: {error}",
                 if error > self.config.reducing_task_config.max_error:
                     raise ReducingError("Invalid user initial threshold")
 
-            threshold = initial_threshold
+            threshold_increment = self.config.reducing_task_config.threshold_increment or initial_threshold
+            prev_threshold = initial_threshold
+            prev_retained_species = retained_species
             prev_model_path = model_path
             prev_retained_species_count = len(retained_species)
             prev_retained_reactions_count = retained_reactions_count
             prev_error = error
-            while True:
-                if self.config.reducing_task_config.threshold_increment:
-                    threshold += self.config.reducing_task_config.threshold_increment
-                else:
-                    threshold += initial_threshold
 
-                self.logger.info("Reduce model with threshold: {threshold}", threshold=threshold)
-                retained_species = reducers_manager.reduce(threshold)
-                if len(retained_species) == prev_retained_species_count:
+            # gallop: threshold step is doubled until the error limit is exceeded
+            failed_threshold: float | None = None
+            unchanged_steps = 0
+            for threshold, retained_species in self._reduce_sweep(
+                reducers_manager, initial_threshold, threshold_increment
+            ):
+                if retained_species == prev_retained_species:
                     logger.info(
                         "Reducing model doesn't reduce more species with threshold: {threshold}", threshold=threshold
                     )
+                    prev_threshold = threshold
+                    unchanged_steps += 1
+                    if unchanged_steps == DEFAULT_THRESHOLDS_BATCH_SIZE:
+                        self.logger.info("Stop increasing threshold because it doesn't reduce model anymore")
+                        break
                     continue
+                unchanged_steps = 0
 
-                self.logger.info(
-                    "Model reduced with {retained_species_count} species and threshold {threshold}",
-                    retained_species_count=len(retained_species),
-                    threshold=threshold,
+                model_path, retained_reactions_count, error = self._try_reduced_model(
+                    threshold, retained_species, original_ignition_delays
                 )
-
-                model, model_path = self._create_reduced_model(retained_species)
-                retained_reactions_count = len(model.reactions())
-                self.logger.info(
-                    "Created reduced model with {retained_species_count} species and \
-{retained_reactions_count} reactions: `{model_path}`",
-                    retained_species_count=len(retained_species),
-                    retained_reactions_count=retained_reactions_count,
-                    model_path=model_path,
-                )
-
-                self.logger.info("Calculating error")
-                error = self._calc_error(model_path, original_ignition_delays)
                 if error > self.config.reducing_task_config.max_error:
-                    self.logger.info(
-                        "Reduced model with {retained_species_count} species and {retained_reactions_count} \
-reactions at `{model_path}` gives too large error: {error}",
-                        retained_species_count=len(retained_species),
-                        retained_reactions_count=retained_reactions_count,
-                        model_path=model_path,
-                        error=error * 100,
-                    )
+                    failed_threshold = threshold
                     break
 
+                prev_threshold = threshold
+                prev_retained_species = retained_species
                 prev_model_path = model_path
                 prev_retained_species_count = len(retained_species)
                 prev_retained_reactions_count = retained_reactions_count
                 prev_error = error
 
-                self.logger.info(
-                    "Reduced model with {retained_species_count} species and {retained_reactions_count} \
-at `{model_path}` gives error: {error}",
-                    retained_species_count=len(retained_species),
-                    retained_reactions_count=retained_reactions_count,
-                    model_path=model_path,
-                    error=error * 100,
+            # bisect between last threshold satisfying error limit and first one exceeding it
+            while failed_threshold is not None and failed_threshold - prev_threshold > threshold_increment:
+                threshold = (prev_threshold + failed_threshold) / 2
+                self.logger.info("Reduce model with threshold: {threshold}", threshold=threshold)
+                retained_species = reducers_manager.reduce(threshold)
+                if retained_species == prev_retained_species:
+                    prev_threshold = threshold
+                    continue
+
+                model_path, retained_reactions_count, error = self._try_reduced_model(
+                    threshold, retained_species, original_ignition_delays
                 )
+                if error > self.config.reducing_task_config.max_error:
+                    failed_threshold = threshold
+                    continue
+
+                prev_threshold = threshold
+                prev_retained_species = retained_species
+                prev_model_path = model_path
+                prev_retained_species_count = len(retained_species)
+                prev_retained_reactions_count = retained_reactions_count
+                prev_error = error
 
             self.logger.info(
                 "Use model with {retained_species_count} species and {retained_reactions_count} \
@@ -277,7 +420,7 @@ at `{model_path}` as result",
             )
             self.logger.info("Copying model to output path")
             try:
-                shutil.copyfile(model_path, self.config.output)
+                shutil.copyfile(prev_model_path, self.config.output)
             except Exception as error:
                 raise RuntimeError(f"Failed to copy result reduced model to {self.config.output}") from error
 
@@ -1,5 +1,7 @@
+import contextlib
 import multiprocessing
 from enum import Enum, auto
+from multiprocessing.shared_memory import SharedMemory
 from multiprocessing.synchronize import BoundedSemaphore
 from typing import Any, cast
 
@@ -10,56 +12,56 @@ from numpy.typing import NDArray
 
 from .algorithms import create_matrix_for_drg, create_matrix_for_drgep, create_matrix_for_pfa
 from .config import Config
-from .cpp_interface import CSRAdjacencyMatrix
+from .cpp_interface import CSRAdjacencyMatrix, run_reducing_for_matrixes
 from .typing import ReducingMethod
 from .utils import (
     DEFAULT_JOIN_TIMEOUT_AFTER_TERMINATION,
-    NumpyArrayDumper,
     Worker,
     WorkersManager,
-    create_unique_file,
     get_species_indexes,
     load_model,
 )
 
 
 class Command(int, Enum):
-    REDUCE = auto()
+    REDUCE_BATCH = auto()
     STOP = auto()
 
 
 class Answer(int, Enum):
     MATRIX_CREATED = auto()
     ERROR = auto()
-    REDUCED = auto()
+    REDUCED_BATCH = auto()
 
 
 class Reducer(Worker):
     def __init__(
         self,
         config: Config,
-        state_saver: NumpyArrayDumper,
-        ai_condition_idx: int,
-        state_idx: int,
-        reducing_sem: BoundedSemaphore,
-        creating_matrix_sem: BoundedSemaphore,
+        samples_layout: list[tuple[int, tuple[int, int]]],
+        sources: NDArray[np.uintp],
+        reducer_idx: int,
+        reducers_count: int,
+        creating_matrix_sem: BoundedSemaphore | None,
     ) -> None:
-        super().__init__(name=f"reduces_for_{ai_condition_idx}_ai_condition_and_{state_idx}_state")
+        super().__init__(name=f"reducer_{reducer_idx}", cpu_idx=reducer_idx if config.pin_workers_to_cpus else None)
 
         self.config = config
-        self.state_saver = state_saver
-        self.ai_condition_idx = ai_condition_idx
-        self.state_idx = state_idx
-        self.reducing_sem = reducing_sem
+        # samples are shared by manager only when it is opened
+        self.samples_shm_name: str | None = None
+        self.samples_layout = samples_layout
+        self.sources = sources
+        self.reducer_idx = reducer_idx
+        self.reducers_count = reducers_count
         self.creating_matrix_sem = creating_matrix_sem
 
         self.logger = logger
 
-    def _create_matrix(self, model: Solution) -> CSRAdjacencyMatrix:
-        with self.state_saver.open("r"):
-            state = self.state_saver.read_data()
-        temperature, pressure = state[:2:]
-        mass_fractions = state[2::]
+    def _create_matrix(
+        self, model: Solution, ai_condition_idx: int, state_idx: int, state: NDArray[np.float64]
+    ) -> CSRAdjacencyMatrix:
+        temperature, pressure = float(state[0]), float(state[1])
+        mass_fractions = np.ascontiguousarray(state[2:])
 
         if self.config.reducing_task_config.method == ReducingMethod.DRG:
             return create_matrix_for_drg(
@@ -69,8 +71,8 @@ class Reducer(Worker):
                 mass_fractions,
                 save=self.config.verbose >= 3,
                 tmp_dir=self.config.tmp_dir,
-                ai_cond_idx=self.ai_condition_idx,
-                state_idx=self.state_idx,
+                ai_cond_idx=ai_condition_idx,
+                state_idx=state_idx,
             )
         if self.config.reducing_task_config.method == ReducingMethod.DRGEP:
             return create_matrix_for_drgep(
@@ -80,8 +82,8 @@ class Reducer(Worker):
                 mass_fractions,
                 save=self.config.verbose >= 3,
                 tmp_dir=self.config.tmp_dir,
-                ai_cond_idx=self.ai_condition_idx,
-                state_idx=self.state_idx,
+                ai_cond_idx=ai_condition_idx,
+                state_idx=state_idx,
             )
         return create_matrix_for_pfa(
             model,
@@ -90,74 +92,97 @@ class Reducer(Worker):
             mass_fractions,
             save=self.config.verbose >= 3,
             tmp_dir=self.config.tmp_dir,
-            ai_cond_idx=self.ai_condition_idx,
-            state_idx=self.state_idx,
+            ai_cond_idx=ai_condition_idx,
+            state_idx=state_idx,
         )
 
-    def _reduce(self, sources: NDArray[np.uintp], threshold: float, matrix: CSRAdjacencyMatrix) -> NumpyArrayDumper:
-        retained_species = matrix.run_reducing(self.config.reducing_task_config.method.name, threshold, sources)  # type: ignore[arg-type]
-        prefix = "retained_species_for_{}_state_of_{}_ai_cond_with_threshold_{}_".format(
-            self.state_idx, self.ai_condition_idx, str(threshold).replace(".", "p")
-        )
-        filepath = create_unique_file(
-            dir=self.config.tmp_dir,
-            prefix=prefix,
-            suffix=".npy",
+    def _read_own_states(self) -> list[tuple[int, int, NDArray[np.float64]]]:
+        # states of all cases are numbered one after another and dealt to reducers in turn.
+        # Repeated states give same matrix so only first of them is dealt
+        states: list[tuple[int, int, NDArray[np.float64]]] = []
+        seen_states: set[bytes] = set()
+        if self.samples_shm_name is None:
+            raise RuntimeError("Samples are not shared")
+        samples_shm = SharedMemory(name=self.samples_shm_name)
+        try:
+            global_state_idx = 0
+            for ai_condition_idx, (sample_offset, (states_count, state_size)) in enumerate(self.samples_layout):
+                for state_idx in range(states_count):
+                    state_offset = sample_offset + state_idx * state_size * np.dtype(np.float64).itemsize
+                    # copy to not hold exported pointers to shared buffer
+                    state = np.array(
+                        np.ndarray((state_size,), dtype=np.float64, buffer=samples_shm.buf, offset=state_offset)
+                    )
+                    state_key = state.tobytes()
+                    if state_key in seen_states:
+                        self.logger.debug(
+                            "Skip {state_idx} state of {ai_condition_idx} case because it repeats",
+                            state_idx=state_idx,
+                            ai_condition_idx=ai_condition_idx,
+                        )
+                        continue
+                    seen_states.add(state_key)
+
+                    if global_state_idx % self.reducers_count == self.reducer_idx:
+                        states.append((ai_condition_idx, state_idx, state))
+                    global_state_idx += 1
+        finally:
+            samples_shm.close()
+        return states
+
+    def _create_matrixes(self, model: Solution) -> list[CSRAdjacencyMatrix]:
+        matrixes: list[CSRAdjacencyMatrix] = []
+        for ai_condition_idx, state_idx, state in self._read_own_states():
+            self.logger.debug(
+                "Create matrix for {state_idx} state of {ai_condition_idx} case",
+                state_idx=state_idx,
+                ai_condition_idx=ai_condition_idx,
+            )
+            matrixes.append(self._create_matrix(model, ai_condition_idx, state_idx, state))
+        return matrixes
+
+    def _reduce(self, threshold: float, matrixes: list[CSRAdjacencyMatrix], species_count: int) -> NDArray[np.bool_]:
+        if not matrixes:
+            # all states of the reducer are repeated ones
+            return np.zeros(species_count, dtype=np.bool_)
+        return run_reducing_for_matrixes(
+            matrixes,
+            self.config.reducing_task_config.method.name,  # type: ignore[arg-type]
+            threshold,
+            self.sources,
         )
-        with NumpyArrayDumper(self.config.tmp_dir, filepath.name).open("w") as retained_species_saver:
-            retained_species_saver.write_data(retained_species)
-        return retained_species_saver
 
     def _target_to_run(self) -> None:
         try:
-            with self.creating_matrix_sem:
+            with self.creating_matrix_sem or contextlib.nullcontext():
+                # model is loaded once and reused for all states of the reducer
                 model = load_model(self.config.reducing_task_config.model)
-                self.logger.debug(
-                    "Create matrix for {state_idx} state of {ai_condition_idx} case",
-                    state_idx=self.state_idx,
-                    ai_condition_idx=self.ai_condition_idx,
-                )
-                matrix = self._create_matrix(model)
-
-                self.logger.debug(
-                    "Matrix for {state_idx} state of {ai_condition_idx} case is created",
-                    state_idx=self.state_idx,
-                    ai_condition_idx=self.ai_condition_idx,
-                )
+                matrixes = self._create_matrixes(model)
 
-                self._send_msg_to_parent((Answer.MATRIX_CREATED, ()))
+                self.logger.debug("Matrixes for {reducer_idx} reducer are created", reducer_idx=self.reducer_idx)
 
-                sources = get_species_indexes(self.config.reducing_task_config.target_species, model)
+                self._send_msg_to_parent((Answer.MATRIX_CREATED, ()))
 
             while True:
                 command, command_args = cast(tuple[Command, tuple[Any, ...]], self._get_msg_from_parent())
                 if command == Command.STOP:
                     return
-                threshold = cast(tuple[float], command_args)[0]
-                with self.reducing_sem:
-                    retained_species_saver = self._reduce(sources, threshold, matrix)
-                    self._send_msg_to_parent((Answer.REDUCED, (retained_species_saver,)))
+                thresholds = cast(tuple[list[float]], command_args)[0]
+                retained_species_batch = [
+                    self._reduce(threshold, matrixes, model.n_species) for threshold in thresholds
+                ]
+                self._send_msg_to_parent((Answer.REDUCED_BATCH, (retained_species_batch,)))
         except KeyboardInterrupt:
-            self.logger.info(
-                "Cancelling reducer worker for {state_idx} state of {ai_condition_idx} case",
-                state_idx=self.state_idx,
-                ai_condition_idx=self.ai_condition_idx,
-            )
+            self.logger.info("Cancelling {reducer_idx} reducer worker", reducer_idx=self.reducer_idx)
         except BaseException as error:
             self.logger.opt(exception=error).critical(
-                "Error while reducing or creating matrix for {state_idx} state of {ai_condition_idx} case",
-                state_idx=self.state_idx,
-                ai_condition_idx=self.ai_condition_idx,
+                "Error while reducing or creating matrixes in {reducer_idx} reducer", reducer_idx=self.reducer_idx
             )
             self._send_msg_to_parent((Answer.ERROR, ()))
             if not isinstance(error, Exception):
                 raise
         finally:
-            self.logger.trace(
-                "Complete logger for reducer worker for {state_idx} state of {ai_condition_idx} case",
-                state_idx=self.state_idx,
-                ai_condition_idx=self.ai_condition_idx,
-            )
+            self.logger.trace("Complete logger for {reducer_idx} reducer worker", reducer_idx=self.reducer_idx)
             self.logger.complete()
 
 
@@ -165,15 +190,20 @@ class ReducersManager(WorkersManager):
     def __init__(
         self,
         config: Config,
-        samples_savers: list[NumpyArrayDumper],
+        samples: list[NDArray[np.float64]],
         *,
         join_timeout: float = DEFAULT_JOIN_TIMEOUT_AFTER_TERMINATION,
     ) -> None:
         self.config = config
-        self.samples_savers = samples_savers
+        self.samples = samples
 
-        self._reducing_sem = multiprocessing.BoundedSemaphore(config.num_threads)
-        self._creating_matrixes_sem = multiprocessing.BoundedSemaphore(config.creating_matrixes_num_threads)
+        self._samples_layout = self._get_samples_layout()
+        self._samples_shm: SharedMemory | None = None
+
+        model = load_model(self.config.reducing_task_config.model)
+        # sources are same for all reducers so they are found once here
+        self._sources = get_species_indexes(config.reducing_task_config.target_species, model)
+        self._sources.flags.writeable = False
 
         super().__init__(self._create_reducers())  # type: ignore[arg-type]
 
@@ -181,62 +211,96 @@ class ReducersManager(WorkersManager):
 
         self._matrixes_created = False
 
-        model = load_model(self.config.reducing_task_config.model)
-        self.retained_species = set(get_species_indexes(config.reducing_task_config.retained_species, model=model))
-
-    def _create_state_saver(self, ai_cond_idx: int, state_idx: int, state: NDArray[np.float64]) -> NumpyArrayDumper:
-        state_saver = NumpyArrayDumper(
-            dir=self.config.tmp_dir,
-            filename=create_unique_file(
-                dir=self.config.tmp_dir,
-                prefix=f"state_{state_idx}_of_{ai_cond_idx}_ai_cond_",
-                suffix=".npy",
-            ).name,
+        self.retained_species: set[int] = set(
+            get_species_indexes(config.reducing_task_config.retained_species, model=model).tolist()
         )
-        with state_saver.open("w"):
-            state_saver.write_data(state)
-        return state_saver
+        self._retained_species_mask = np.zeros(model.n_species, dtype=np.bool_)
+        self._retained_species_mask[list(self.retained_species)] = True
+
+    def _get_samples_layout(self) -> list[tuple[int, tuple[int, int]]]:
+        # offsets and shapes of samples packed one after another into one shared memory block
+        layout: list[tuple[int, tuple[int, int]]] = []
+        offset = 0
+        for sample in self.samples:
+            layout.append((offset, cast(tuple[int, int], sample.shape)))
+            offset += sample.size * np.dtype(np.float64).itemsize
+        return layout
+
+    def _share_samples(self) -> SharedMemory:
+        samples_size = sum(sample.size for sample in self.samples) * np.dtype(np.float64).itemsize
+        samples_shm = SharedMemory(create=True, size=max(samples_size, 1))
+        try:
+            for sample, (offset, sample_shape) in zip(self.samples, self._samples_layout, strict=True):
+                np.ndarray(sample_shape, dtype=np.float64, buffer=samples_shm.buf, offset=offset)[:] = sample
+        except BaseException:
+            samples_shm.close()
+            samples_shm.unlink()
+            raise
+        return samples_shm
+
+    def _unlink_samples(self) -> None:
+        if self._samples_shm is None:
+            return
+        self._samples_shm.close()
+        self._samples_shm.unlink()
+        self._samples_shm = None
 
     def _create_reducers(self) -> list[Reducer]:
-        reducers: list[Reducer] = []
-        for ai_cond_idx, sample_saver in enumerate(self.samples_savers):
-            with sample_saver.open("r"):
-                for state_idx in range(sample_saver.saved_arrays_count):
-                    state_saver = self._create_state_saver(ai_cond_idx, state_idx, sample_saver.read_data())
-
-                    reducers.append(
-                        Reducer(
-                            config=self.config,
-                            state_saver=state_saver,
-                            ai_condition_idx=ai_cond_idx,
-                            state_idx=state_idx,
-                            reducing_sem=self._reducing_sem,
-                            creating_matrix_sem=self._creating_matrixes_sem
-                        )
-                    )
-
-        return reducers
+        # fixed pool of reducers each holding matrixes of its part of states
+        states_count = sum(sample_shape[0] for __, sample_shape in self._samples_layout)
+        reducers_count = max(min(self.config.num_threads, states_count), 1)
+        # count of reducers already bounds matrixes creating unless it is limited more
+        creating_matrixes_sem = (
+            multiprocessing.BoundedSemaphore(self.config.creating_matrixes_num_threads)
+            if self.config.creating_matrixes_num_threads < reducers_count
+            else None
+        )
+        return [
+            Reducer(
+                config=self.config,
+                samples_layout=self._samples_layout,
+                sources=self._sources,
+                reducer_idx=reducer_idx,
+                reducers_count=reducers_count,
+                creating_matrix_sem=creating_matrixes_sem,
+            )
+            for reducer_idx in range(reducers_count)
+        ]
 
     def open(self) -> None:
         self.logger.info("Creating matrixes")
-        return super().open()
+        # samples are shared only for started reducers, so manager which is never opened holds no shared memory
+        self._samples_shm = self._share_samples()
+        try:
+            for reducer in cast(list[Reducer], self.workers):
+                reducer.samples_shm_name = self._samples_shm.name
+            super().open()
+        except BaseException:
+            self._unlink_samples()
+            raise
 
     def __enter__(self) -> "ReducersManager":
         return cast(ReducersManager, super().__enter__())
 
     def close(self) -> None:
         self.logger.trace("Close reducer workers")
-        for reducer in self.workers:
-            reducer.send_to_worker((Command.STOP, ()))
-            reducer.join(self.join_timeout)
-            if reducer.is_alive():
-                self.logger.error("Reducer worker process is still alive")
-        super().close()
+        try:
+            for reducer in self.workers:
+                reducer.send_to_worker((Command.STOP, ()))
+                reducer.join(self.join_timeout)
+                if reducer.is_alive():
+                    self.logger.error("Reducer worker process is still alive")
+            super().close()
+        finally:
+            self._unlink_samples()
 
     def reduce(self, threshold: float) -> set[int]:
+        return self.reduce_batch([threshold])[0]
+
+    def reduce_batch(self, thresholds: list[float]) -> list[set[int]]:
         if not self._matrixes_created:
-            for reducer in self.workers:
-                message, details = cast(tuple[Answer, tuple[Any, ...]], reducer.get_msg_from_worker())
+            for __, msg in self.gather_msgs_from_workers():
+                message, details = cast(tuple[Answer, tuple[Any, ...]], msg)
                 if message != Answer.MATRIX_CREATED:
                     raise RuntimeError("Error in reducer process. Creating matrix failed")
 
@@ -245,17 +309,18 @@ class ReducersManager(WorkersManager):
             self._matrixes_created = True
 
         for reducer in self.workers:
-            reducer.send_to_worker((Command.REDUCE, (threshold,)))
+            reducer.send_to_worker((Command.REDUCE_BATCH, (thresholds,)))
 
-        retained_species = self.retained_species
-        for reducer in self.workers:
-            message, details = cast(tuple[Answer, tuple[Any, ...]], reducer.get_msg_from_worker())
+        retained_species_masks = [self._retained_species_mask.copy() for __ in thresholds]
+        for __, msg in self.gather_msgs_from_workers():
+            message, details = cast(tuple[Answer, tuple[Any, ...]], msg)
 
-            if message != Answer.REDUCED:
+            if message != Answer.REDUCED_BATCH:
                 raise RuntimeError("Error in reducer process. Reduce failed")
 
-            retained_species_saver = cast(NumpyArrayDumper, details[0])
-            with retained_species_saver.open("r"):
-                retained_species = retained_species.union(cast(NDArray[np.uintp], retained_species_saver.read_data()))
+            for retained_species_mask, reducer_retained_species_mask in zip(
+                retained_species_masks, cast(list[NDArray[np.bool_]], details[0]), strict=True
+            ):
+                retained_species_mask |= reducer_retained_species_mask
 
-        return retained_species
+        return [set(np.flatnonzero(retained_species_mask).tolist()) for retained_species_mask in retained_species_masks]
@@ -1,20 +1,22 @@
-import multiprocessing
-from contextlib import contextmanager
+import contextlib
+import secrets
 from enum import Enum, auto
-from multiprocessing.synchronize import BoundedSemaphore
-from typing import Any, Generator, cast
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, cast
 
 import numpy as np
 from cantera import (  # type: ignore[import-untyped]
     IdealGasConstPressureReactor,
     IdealGasReactor,
     ReactorNet,
+    Solution,
     one_atm,
 )
 from loguru import logger
 from numpy.typing import NDArray
 
 from .config import Config
+from .cpp_interface import update_max_and_compute_residual
 from .errors import NoAutoignitionError, SampleCreatingError, TooSmallStepsSampleError
 from .typing import AmountDefinitionType, PathLike
 from .utils import NumpyArrayDumper, Worker, WorkersManager, create_unique_file, load_model
@@ -26,6 +28,26 @@ class Answer(int, Enum):
     END = auto()
 
 
+# initial capacity of in-memory steps buffer, it is doubled when it is filled
+STEPS_BUFFER_INITIAL_CAPACITY = 1024
+
+# temperature rise that is treated as ignition
+IGNITION_TEMPERATURE_RISE = 400.0
+
+
+def get_sample_shm_name(samples_shm_prefix: str, ai_condition_idx: int) -> str:
+    # names of samples are known to manager in advance, so it can unlink them whatever happened to workers
+    return f"{samples_shm_prefix}_{ai_condition_idx}"
+
+
+def unlink_sample(sample_shm_name: str) -> None:
+    # sample which is not received by parent is removed from shared memory by name
+    with contextlib.suppress(FileNotFoundError):
+        sample_shm = SharedMemory(name=sample_shm_name)
+        sample_shm.close()
+        sample_shm.unlink()
+
+
 class StateLogger:
     def __init__(self, tmp_dir: PathLike, ai_condition_idx: int, n_species: int) -> None:
         self.max_temperature: float | None = None
@@ -36,52 +58,49 @@ class StateLogger:
         self.tmp_dir = tmp_dir
         self.n_species = n_species
 
-        self._dumper: NumpyArrayDumper | None = None
+        # rows are (time, temperature, pressure, mass fractions...), buffer is allocated by first logged step
+        self._steps: NDArray[np.float64] = np.empty((0, 3 + n_species), dtype=np.float64)
 
     def update(self, time: float, temperature: float, pressure: float, mass_fractions: NDArray[np.float64]) -> None:
-        if self._dumper is None:
-            raise ValueError("Not have been opened to write")
         if self.max_temperature is None or self.max_temperature < temperature:
             self.max_temperature = temperature
+
+        if self.logged_steps_count == len(self._steps):
+            steps = np.empty(
+                (max(2 * len(self._steps), STEPS_BUFFER_INITIAL_CAPACITY), self._steps.shape[1]), dtype=np.float64
+            )
+            steps[: self.logged_steps_count] = self._steps
+            self._steps = steps
+        step = self._steps[self.logged_steps_count]
+        step[0] = time
+        step[1] = temperature
+        step[2] = pressure
+        step[3:] = mass_fractions
         self.logged_steps_count += 1
-        array = np.concatenate((np.array([time, temperature, pressure], dtype=np.float64), mass_fractions), axis=0)
-        self._dumper.write_data(array)
 
-    def read_step_data(self) -> tuple[float, float, float, NDArray[np.float64]]:
-        if self._dumper is None:
-            raise ValueError("Not have been opened to read")
-        array = self._dumper.read_data()
-        time, temperature, pressure = array[:3:]
-        return time, temperature, pressure, array[3::]
+    @property
+    def steps(self) -> NDArray[np.float64]:
+        return self._steps[: self.logged_steps_count]
+
+    @property
+    def temperatures(self) -> NDArray[np.float64]:
+        return self._steps[: self.logged_steps_count, 1]
+
+    def read_steps(self, steps_idxs: NDArray[np.intp]) -> NDArray[np.float64]:
+        return self.steps[steps_idxs]
 
     def set_ignition_delay_and_temperature(self, ignition_delay: float, temperature: float) -> None:
         self.ignition_delay = ignition_delay
         self.ignition_temperature = temperature
 
-    @contextmanager
-    def open_to_write(self) -> Generator["StateLogger", Any, Any]:
-        try:
-            filename = create_unique_file(
-                suffix=".npy",
-                prefix=f"steps_cache_of_{self.ai_condition_idx}_ai_cond_for_model_with_{self.n_species}_species_",
-                dir=self.tmp_dir,
-            ).name
-            self._dumper = NumpyArrayDumper(dir=self.tmp_dir, filename=filename)
-            self._dumper.open("w")
-
-            yield self
-        finally:
-            self._dumper.close() # type: ignore[union-attr]
-
-    @contextmanager
-    def open_to_read(self) -> Generator["StateLogger", Any, Any]:
-        if self._dumper is None:
-            raise ValueError("Not have been opened to write")
-        try:
-            self._dumper.open("r")
-            yield self
-        finally:
-            self._dumper.close()
+    def dump(self) -> None:
+        filename = create_unique_file(
+            suffix=".npy",
+            prefix=f"steps_of_{self.ai_condition_idx}_ai_cond_for_model_with_{self.n_species}_species_",
+            dir=self.tmp_dir,
+        ).name
+        with NumpyArrayDumper(dir=self.tmp_dir, filename=filename).open("w") as dumper:
+            dumper.write_data(self.steps)
 
 
 class Simulation(Worker):
@@ -89,24 +108,44 @@ class Simulation(Worker):
         self,
         config: Config,
         model_path: PathLike,
-        ai_condition_idx: int,
-        sem: BoundedSemaphore,
+        simulation_idx: int,
+        simulations_count: int,
         *,
         only_ignition_delay: bool,
+        samples_shm_prefix: str,
     ) -> None:
-        super().__init__(name=f"simulation_for_{ai_condition_idx}_ai_condition")
+        super().__init__(
+            name=f"simulation_{simulation_idx}", cpu_idx=simulation_idx if config.pin_workers_to_cpus else None
+        )
 
         self.config = config
         self.model_path = model_path
-        self.ai_condition_idx = ai_condition_idx
-        self.sem = sem
+        self.simulation_idx = simulation_idx
+        self.simulations_count = simulations_count
         self.only_ignition_delay = only_ignition_delay
+        self.samples_shm_prefix = samples_shm_prefix
         self.logger = logger
 
-    def _simulate(self) -> StateLogger:  # noqa: C901
-        model = load_model(self.model_path)
+        # parsed once in worker process and reused for all its cases
+        self._model: Solution | None = None
 
-        ai_condition = self.config.reducing_task_config.autoignition_conditions[self.ai_condition_idx]
+    @property
+    def ai_conditions_idxs(self) -> range:
+        # cases are dealt to simulation workers in turn
+        return range(
+            self.simulation_idx, len(self.config.reducing_task_config.autoignition_conditions), self.simulations_count
+        )
+
+    def _load_model(self) -> Solution:
+        if self._model is None:
+            self._model = load_model(self.model_path)
+        return self._model
+
+    def _simulate(self, ai_condition_idx: int) -> StateLogger:  # noqa: C901
+        # state of model is fully reset by case conditions below and each case creates its own reactor
+        model = self._load_model()
+
+        ai_condition = self.config.reducing_task_config.autoignition_conditions[ai_condition_idx]
 
         if ai_condition.equivalence_ratio:
             model.TP = (
@@ -167,57 +206,95 @@ class Simulation(Worker):
 
         residual_threshold = ai_condition.residual_threshold_coef * simulation.rtol
 
-        state_logger: StateLogger = StateLogger(self.config.tmp_dir, self.ai_condition_idx, n_species=model.n_species)
+        state_logger: StateLogger = StateLogger(self.config.tmp_dir, ai_condition_idx, n_species=model.n_species)
+
+        # temperature step of sample is at least ignition rise divided by sample size,
+        # so colder steps are never sampled and are not logged.
+        # No step is logged if only ignition delay is needed, so logging is checked by one comparison
+        min_logged_temperature = (
+            np.inf
+            if self.only_ignition_delay
+            else ai_condition.temperature + IGNITION_TEMPERATURE_RISE / ai_condition.steps_sample_size
+        )
 
         def sim() -> None:
             ignition_delay: float | None = None
             ignition_temperature: float | None = None
 
-            max_state_values = simulation.get_state()
-
-            if not self.only_ignition_delay:
-                state_logger.update(simulation.time, reactor.T, reactor.thermo.P, reactor.Y)
-
-            step_idx = 0
-            while step_idx < ai_condition.max_steps and (end_of_time is None or simulation.time < end_of_time):
-                prev_state = simulation.get_state()
-
-                simulation.step()
-
-                if not self.only_ignition_delay:
-                    state_logger.update(simulation.time, reactor.T, reactor.thermo.P, reactor.Y)
+            prev_state = simulation.get_state()
+            max_state_values = prev_state.copy()
+            atol = float(simulation.atol)
+
+            # loop invariants and bound methods are fetched once
+            step = simulation.step
+            get_state = simulation.get_state
+            update_state_logger = state_logger.update
+            max_steps = ai_condition.max_steps
+            max_time = np.inf if end_of_time is None else end_of_time
+            ignition_temperature_threshold = ai_condition.temperature + IGNITION_TEMPERATURE_RISE
+
+            # temperature and mass fractions are taken from state of network instead of separate reactor calls
+            temperature_idx = reactor.component_index("temperature")
+            species_offset = reactor.component_index(model.species_name(0))
+            # pressure is read only for logged steps and only if it changes
+            constant_pressure = reactor.thermo.P if ai_condition.kind == "CONSTANT_PRESSURE" else None
+
+            time = simulation.time
+            if min_logged_temperature <= prev_state[temperature_idx]:
+                update_state_logger(
+                    time,
+                    prev_state[temperature_idx],
+                    reactor.thermo.P if constant_pressure is None else constant_pressure,
+                    prev_state[species_offset:],
+                )
 
-                if ai_condition.temperature + 400.0 <= reactor.T and ignition_delay is None:
-                    ignition_delay = simulation.time
-                    ignition_temperature = reactor.T
+            for __ in range(max_steps):
+                if max_time <= time:
                     break
+                # step returns time reached by it
+                time = step()
+
+                current_state = get_state()
+                temperature = current_state[temperature_idx]
+
+                if min_logged_temperature <= temperature:
+                    update_state_logger(
+                        time,
+                        temperature,
+                        reactor.thermo.P if constant_pressure is None else constant_pressure,
+                        current_state[species_offset:],
+                    )
 
-                current_state = simulation.get_state()
-                max_state_values = np.maximum(max_state_values, current_state)
+                if ignition_temperature_threshold <= temperature and ignition_delay is None:
+                    ignition_delay = time
+                    ignition_temperature = float(temperature)
+                    break
 
-                residual = np.linalg.norm(
-                    (current_state - prev_state) / (max_state_values + simulation.atol)
-                ) / np.sqrt(simulation.n_vars)
+                # running maximum and residual are computed by one native call
+                residual = update_max_and_compute_residual(current_state, prev_state, max_state_values, atol)
 
                 if residual < residual_threshold:
                     break
 
+                # state after this step is state before next one
+                prev_state = current_state
+
             if ignition_delay is not None and ignition_temperature is not None:
                 state_logger.set_ignition_delay_and_temperature(ignition_delay, ignition_temperature)
 
-        if self.only_ignition_delay:
-            sim()
-            return state_logger
+        sim()
 
-        with state_logger.open_to_write():
-            sim()
+        # steps are kept in memory and are saved only for debugging
+        if state_logger.logged_steps_count and self.config.verbose >= 3:
+            logger.trace("Save steps")
+            state_logger.dump()
         return state_logger
 
-    def _create_sample(self, state_logger: StateLogger) -> NumpyArrayDumper:
-        ai_condition = self.config.reducing_task_config.autoignition_conditions[self.ai_condition_idx]
+    def _create_sample(self, ai_condition_idx: int, state_logger: StateLogger) -> tuple[str, tuple[int, int]]:
+        ai_condition = self.config.reducing_task_config.autoignition_conditions[ai_condition_idx]
 
         if state_logger.ignition_delay is None or state_logger.ignition_temperature is None:
-            msg = f"No auto ignition happened for {self.ai_condition_idx} case"
+            msg = f"No auto ignition happened for {ai_condition_idx} case"
             self.logger.error(msg)
             raise NoAutoignitionError(msg)
 
@@ -225,70 +302,80 @@ class Simulation(Worker):
 
         temperature_delta = temperature_diff / ai_condition.steps_sample_size
 
-        filename = create_unique_file(
-            self.config.tmp_dir, prefix=f"steps_sample_of_{self.ai_condition_idx}_ai_case_", suffix=".npy"
-        ).name
-
-        with (
-            state_logger.open_to_read(),
-            NumpyArrayDumper(
-                dir=self.config.tmp_dir,
-                filename=filename,
-            ).open("w") as sample_saver,
-        ):
-            i = 0
-            for __ in range(state_logger.logged_steps_count):
-                __, temperature, pressure, mass_fractions = state_logger.read_step_data()  # type: ignore[assignment]
-                if temperature >= ai_condition.temperature + (i + 1) * temperature_delta:
-                    data = np.concatenate((np.array((temperature, pressure), dtype=np.float64), mass_fractions), axis=0)
-                    sample_saver.write_data(data)
-                    i += 1
-                    if i == 20:
-                        break
-
-        if i < ai_condition.steps_sample_size:
-            msg = f"Too small steps sample is got for {self.ai_condition_idx} case. \
+        temperatures = state_logger.temperatures
+        thresholds = ai_condition.temperature + np.arange(1, ai_condition.steps_sample_size + 1) * temperature_delta
+        # running maximum is sorted unlike temperatures and first reaches threshold at same step
+        steps_idxs = np.searchsorted(np.maximum.accumulate(temperatures), thresholds)
+        for i in range(1, len(steps_idxs)):
+            if steps_idxs[i] > steps_idxs[i - 1]:
+                continue
+            # several temperatures are reached by one step, so first later step reaching temperature is taken
+            reached = temperatures[steps_idxs[i - 1] + 1 :] >= thresholds[i]
+            steps_idxs[i] = steps_idxs[i - 1] + 1 + int(np.argmax(reached)) if reached.any() else len(temperatures)
+
+        if not len(steps_idxs) or steps_idxs[-1] >= len(temperatures):
+            msg = f"Too small steps sample is got for {ai_condition_idx} case. \
 Change steps sample size or case conditions"
             self.logger.error(msg)
             raise TooSmallStepsSampleError(msg)
 
-        return sample_saver
+        # time is not part of state
+        sample = state_logger.read_steps(steps_idxs)[:, 1:]
+
+        # sample is handed to parent through shared memory which is unlinked by parent
+        sample_shm = SharedMemory(
+            name=get_sample_shm_name(self.samples_shm_prefix, ai_condition_idx), create=True, size=sample.nbytes
+        )
+        try:
+            np.ndarray(sample.shape, dtype=np.float64, buffer=sample_shm.buf)[:] = sample
+        except BaseException:
+            sample_shm.close()
+            sample_shm.unlink()
+            raise
+        sample_shm.close()
+
+        return sample_shm.name, cast(tuple[int, int], sample.shape)
 
     def _target_to_run(self) -> None:
+        # samples are unlinked by parent only if results are sent, otherwise worker unlinks them itself
+        samples_shm_names: list[str] = []
+        results_sent = False
         try:
-            with self.sem:
-                self.logger.debug("Run simulation for {ai_condition_idx} case", ai_condition_idx=self.ai_condition_idx)
-                state_logger = self._simulate()
+            # results of all cases of the worker are sent at once
+            results: list[tuple[Any, ...]] = []
+            for ai_condition_idx in self.ai_conditions_idxs:
+                self.logger.debug("Run simulation for {ai_condition_idx} case", ai_condition_idx=ai_condition_idx)
+                state_logger = self._simulate(ai_condition_idx)
                 if self.only_ignition_delay:
-                    self.logger.debug(
-                        "Simulation is finished for {ai_condition_idx} case", ai_condition_idx=self.ai_condition_idx
-                    )
-                    self._send_msg_to_parent((Answer.END, (state_logger.ignition_delay,)))
-                    return
-
-                try:
-                    sample = self._create_sample(state_logger)
-                    self._send_msg_to_parent((Answer.END, (sample, state_logger.ignition_delay)))
-                except SampleCreatingError:
-                    self._send_msg_to_parent((Answer.SAMPLE_ERROR, ()))
-                    return
+                    results.append((ai_condition_idx, state_logger.ignition_delay))
+                else:
+                    try:
+                        sample = self._create_sample(ai_condition_idx, state_logger)
+                    except SampleCreatingError:
+                        self._send_msg_to_parent((Answer.SAMPLE_ERROR, (ai_condition_idx,)))
+                        return
+                    samples_shm_names.append(sample[0])
+                    results.append((ai_condition_idx, sample, state_logger.ignition_delay))
                 self.logger.debug(
-                    "Simulation is finished for {ai_condition_idx} case", ai_condition_idx=self.ai_condition_idx
+                    "Simulation is finished for {ai_condition_idx} case", ai_condition_idx=ai_condition_idx
                 )
+            self._send_msg_to_parent((Answer.END, (results,)))
+            results_sent = True
         except KeyboardInterrupt:
-            self.logger.info(
-                "Cancelling simulation process for {ai_condition_idx} case", ai_condition_idx=self.ai_condition_idx
-            )
+            self.logger.info("Cancelling {simulation_idx} simulation process", simulation_idx=self.simulation_idx)
         except BaseException as error:
             self.logger.opt(exception=error).critical(
-                "Error while simulation for {ai_condition_idx} case", ai_condition_idx=self.ai_condition_idx
+                "Error while simulation in {simulation_idx} simulation process", simulation_idx=self.simulation_idx
             )
             self._send_msg_to_parent((Answer.ERROR, ()))
             if not isinstance(error, Exception):
                 raise
         finally:
+            if not results_sent:
+                for sample_shm_name in samples_shm_names:
+                    unlink_sample(sample_shm_name)
             self.logger.trace(
-                "Complete logger for simulation {ai_condition_idx} case", ai_condition_idx=self.ai_condition_idx
+                "Complete logger for {simulation_idx} simulation process", simulation_idx=self.simulation_idx
             )
             self.logger.complete()
 
@@ -304,51 +391,81 @@ class SimulationManager(WorkersManager):
         self.model_path = model_path
         self.config = config
         self.only_ignition_delays = only_ignition_delays
-
-        self._sem = multiprocessing.BoundedSemaphore(config.num_threads)
+        # short random prefix, because length of shared memory names is limited on some platforms
+        self.samples_shm_prefix = f"hkreduce_{secrets.token_hex(6)}"
 
         super().__init__(self._create_simulations())  # type: ignore[arg-type]
 
     def _create_simulations(self) -> list[Simulation]:
-        simulations: list[Simulation] = []
-        for ai_cond_idx in range(len(self.config.reducing_task_config.autoignition_conditions)):
-            simulations.append(  # noqa: PERF401
-                Simulation(
-                    config=self.config,
-                    model_path=self.model_path,
-                    ai_condition_idx=ai_cond_idx,
-                    sem=self._sem,
-                    only_ignition_delay=self.only_ignition_delays,
-                )
+        # fixed pool of simulation workers each running its part of cases one by one
+        simulations_count = max(
+            min(self.config.num_threads, len(self.config.reducing_task_config.autoignition_conditions)), 1
+        )
+        return [
+            Simulation(
+                config=self.config,
+                model_path=self.model_path,
+                simulation_idx=simulation_idx,
+                simulations_count=simulations_count,
+                only_ignition_delay=self.only_ignition_delays,
+                samples_shm_prefix=self.samples_shm_prefix,
             )
-        return simulations
-
-    def run(self) -> tuple[list[NumpyArrayDumper], list[float]]:
-        with self:
-            samples_savers: list[NumpyArrayDumper] = []
-            ignition_delays: list[float] = []
-            for i, simulation in enumerate(self.workers):
-                message, details = cast(tuple[Answer, tuple[Any, ...]], simulation.get_msg_from_worker())
-                if message == Answer.SAMPLE_ERROR:
-                    self.logger.info(
-                        "No auto ignition detected or too small sample size for {ai_cond_idx} case", ai_cond_idx=i
-                    )
-                    raise SampleCreatingError("No auto ignition detected or too small sample size")
+            for simulation_idx in range(simulations_count)
+        ]
 
-                if message != Answer.END:
-                    raise RuntimeError("Error in simulation worker process")
+    @staticmethod
+    def _receive_sample(sample_shm_name: str, sample_shape: tuple[int, int]) -> NDArray[np.float64]:
+        sample_shm = SharedMemory(name=sample_shm_name)
+        try:
+            return np.array(np.ndarray(sample_shape, dtype=np.float64, buffer=sample_shm.buf))
+        finally:
+            sample_shm.close()
+            sample_shm.unlink()
+
+    def _unlink_samples(self) -> None:
+        # workers terminated after error don't unlink their samples, so every sample name is unlinked here.
+        # Received samples are already unlinked and skipped
+        if self.only_ignition_delays:
+            return
+        for ai_condition_idx in range(len(self.config.reducing_task_config.autoignition_conditions)):
+            unlink_sample(get_sample_shm_name(self.samples_shm_prefix, ai_condition_idx))
+
+    def _gather_results(self) -> tuple[list[NDArray[np.float64]], list[float]]:
+        ai_conditions_count = len(self.config.reducing_task_config.autoignition_conditions)
+        samples: list[NDArray[np.float64] | None] = [None] * ai_conditions_count
+        ignition_delays: list[float] = [0.0] * ai_conditions_count
+        for __, msg in self.gather_msgs_from_workers():
+            message, details = cast(tuple[Answer, tuple[Any, ...]], msg)
+            if message == Answer.SAMPLE_ERROR:
+                self.logger.info(
+                    "No auto ignition detected or too small sample size for {ai_cond_idx} case",
+                    ai_cond_idx=details[0],
+                )
+                raise SampleCreatingError("No auto ignition detected or too small sample size")
 
+            if message != Answer.END:
+                raise RuntimeError("Error in simulation worker process")
+
+            for result in cast(list[tuple[Any, ...]], details[0]):
                 if self.only_ignition_delays:
-                    ignition_delay = details[0]
-                    ignition_delays.append(ignition_delay)
+                    ai_cond_idx, ignition_delay = result
                 else:
-                    sample_saver, ignition_delay = details
-                    samples_savers.append(sample_saver)
-                    ignition_delays.append(ignition_delay)
+                    ai_cond_idx, (sample_shm_name, sample_shape), ignition_delay = result
+                    samples[ai_cond_idx] = self._receive_sample(sample_shm_name, sample_shape)
+                ignition_delays[ai_cond_idx] = ignition_delay
+
+        for simulation in self.workers:
+            simulation.join(self.join_timeout_after_termination)
+            if simulation.is_alive():
+                self.logger.error("Simulation worker process is still alive")
 
-            for simulation in self.workers:
-                simulation.join(self.join_timeout_after_termination)
-                if simulation.is_alive():
-                    self.logger.error("Simulation worker process is still alive")
+        return [sample for sample in samples if sample is not None], ignition_delays
 
-        return samples_savers, ignition_delays
+    def run(self) -> tuple[list[NDArray[np.float64]], list[float]]:
+        try:
+            with self:
+                return self._gather_results()
+        except BaseException:
+            # workers are already finished or terminated here so their samples aren't created anymore
+            self._unlink_samples()
+            raise
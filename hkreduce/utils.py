@@ -1,10 +1,11 @@
 import atexit
 import contextlib
+import functools
 import multiprocessing
 import multiprocessing.connection
 import os
+import selectors
 import threading
-import time
 import weakref
 from abc import ABC, abstractmethod
 from multiprocessing.connection import Connection
@@ -13,7 +14,7 @@ from queue import Empty, Queue
 from tempfile import TemporaryDirectory as OriginalTemporaryDirectory
 from tempfile import mkdtemp, mkstemp
 from time import sleep
-from typing import Any, BinaryIO, Literal, NamedTuple, cast
+from typing import Any, BinaryIO, Callable, Iterator, Literal, NamedTuple, cast
 
 import cantera as ct  # type: ignore[import-untyped]
 import numpy as np
@@ -68,6 +69,10 @@ class NumpyArrayDumper:
                 self.filepath = self.dirpath / self.filename
 
         self._file = open(self.filepath, mode=mode_casted)  # noqa: SIM115
+        if hasattr(os, "posix_fadvise"):
+            # arrays are always written and read one after another from start of file
+            with contextlib.suppress(OSError):
+                os.posix_fadvise(self._file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
 
         return self
 
@@ -121,6 +126,7 @@ class Message(NamedTuple):
 
 
 DEFAULT_POLL_TIMEOUT = 0.001
+WAKEUP_PIPE_READ_SIZE = 4096
 
 
 class Shifter(threading.Thread):
@@ -128,34 +134,51 @@ class Shifter(threading.Thread):
         super().__init__(daemon=True, name="worker_connections_shifter")
 
         self.poll_timeout = poll_timeout
-        self._conns: dict[Connection, tuple[Queue, threading.Event]] = {}
+        self._conns: dict[Connection, tuple[Queue, threading.Event, Callable[[], Any] | None]] = {}
         self._lock = threading.Lock()
+        # conns are registered once in persistent selector (epoll on linux) rather than passed to wait every time.
+        # Pipes are not selectable on windows so wait is used there
+        self._selector: selectors.BaseSelector | None = selectors.DefaultSelector() if os.name == "posix" else None
+        # selector waits without timeout and is woken up by the pipe when conns are added or the shifter is closed
+        self._wakeup_reader: int | None = None
+        self._wakeup_writer: int | None = None
+        if self._selector is not None:
+            self._wakeup_reader, self._wakeup_writer = os.pipe()
+            os.set_blocking(self._wakeup_writer, False)
+            self._selector.register(self._wakeup_reader, selectors.EVENT_READ)
 
         self._closed = False
 
         self._closer = weakref.finalize(self, self.close)
 
-    def run(self) -> None:
-        while not self._closed:
-            with self._lock:
-                conns = self._conns.copy()
-            if not conns:
-                sleep(self.poll_timeout)
-                continue
-
-            ready_conns = cast(
-                list[Connection], multiprocessing.connection.wait(conns.keys(), timeout=self.poll_timeout)
-            )
+    def _wait_ready_conns(self) -> list[Connection]:
+        if self._selector is not None:
+            ready_conns: list[Connection] = []
+            for key, __ in self._selector.select():
+                if key.fileobj == self._wakeup_reader:
+                    os.read(self._wakeup_reader, WAKEUP_PIPE_READ_SIZE)
+                else:
+                    ready_conns.append(cast(Connection, key.fileobj))
+            return ready_conns
 
-            to_remove: list[Connection] = []
+        with self._lock:
+            conns = list(self._conns)
+        if not conns:
+            sleep(self.poll_timeout)
+            return []
+        return cast(list[Connection], multiprocessing.connection.wait(conns, timeout=self.poll_timeout))
 
-            for conn in ready_conns:
-                if conn.closed:
+    def run(self) -> None:
+        while not self._closed:
+            for conn in self._wait_ready_conns():
+                with self._lock:
+                    conn_data = self._conns.get(conn)
+                if conn_data is None or conn.closed:
                     # maybe closed and removed by worker when the shifter was waiting
-                    to_remove.append(conn)
+                    self.remove(conn)
                     continue
 
-                queue = conns[conn][0]
+                queue, closed_event, on_msgs_received = conn_data
                 closed = False
                 try:
                     while conn.poll(0):
@@ -164,28 +187,46 @@ class Shifter(threading.Thread):
                     closed = True
 
                 if closed:
-                    conns[conn][1].set()
-                    to_remove.append(conn)
-                    continue
+                    # readers blocked on the queue are woken up by "finished" message even if worker died silently
+                    queue.put(Message("finished", None))
+                    closed_event.set()
+                    self.remove(conn)
 
-            if not to_remove:
-                continue
-            with self._lock:
-                for conn in to_remove:
-                    self._conns.pop(conn, None)
+                if on_msgs_received is not None:
+                    on_msgs_received()
 
-    def add(self, conn: Connection, queue: Queue, closed_event: threading.Event) -> None:
+    def add(
+        self,
+        conn: Connection,
+        queue: Queue,
+        closed_event: threading.Event,
+        on_msgs_received: Callable[[], Any] | None = None,
+    ) -> None:
         with self._lock:
             if conn in self._conns:
                 raise ValueError("Already added")
-            self._conns[conn] = (queue, closed_event)
+            self._conns[conn] = (queue, closed_event, on_msgs_received)
+            if self._selector is not None:
+                self._selector.register(conn, selectors.EVENT_READ)
+        self._wakeup()
 
     def remove(self, conn: Connection) -> None:
         with self._lock:
-            self._conns.pop(conn, None)
+            if self._conns.pop(conn, None) is None or self._selector is None:
+                return
+            with contextlib.suppress(KeyError, ValueError, OSError):
+                self._selector.unregister(conn)
+
+    def _wakeup(self) -> None:
+        if self._wakeup_writer is None:
+            return
+        # pipe may be full of unread wakeups which is enough to wake up the selector
+        with contextlib.suppress(OSError):
+            os.write(self._wakeup_writer, b"\0")
 
     def close(self) -> None:
         self._closed = True
+        self._wakeup()
 
 
 # this is not in worker class to avoid pickling of parent conn
@@ -203,6 +244,9 @@ class NotPickableContainer:
     def has(self, name: str) -> Any:
         return name in self.attrs
 
+    def set(self, name: str, value: Any) -> None:
+        self.attrs[name] = value
+
     def __getstate__(self) -> dict:
         return {"doesnt-matter": True}
 
@@ -224,19 +268,27 @@ class Worker(ABC, multiprocessing.Process):
     _parent_conn: Connection
     _conns_pair_closed_by_worker: threading.Event
     _parent_queue: Queue
+    _msgs_notifications: Queue | None
 
     def __init__(
         self,
         name: str | None = None,
         *,
         daemon: bool = True,
+        cpu_idx: int | None = None,
     ) -> None:
         super().__init__(name=name, daemon=daemon)
 
+        # index of allowed cpu which worker is pinned to, it isn't pinned if it's None
+        self.cpu_idx = cpu_idx
+
         parent_conn, self._worker_conn = multiprocessing.Pipe()
 
         self._not_pickable = NotPickableContainer(
-            _parent_conn=parent_conn, _conns_pair_closed_by_worker=threading.Event(), _parent_queue=Queue()
+            _parent_conn=parent_conn,
+            _conns_pair_closed_by_worker=threading.Event(),
+            _parent_queue=Queue(),
+            _msgs_notifications=None,
         )
 
     def __getattr__(self, name: str) -> Any:
@@ -251,23 +303,11 @@ class Worker(ABC, multiprocessing.Process):
         raise AttributeError(f'No such attribute "{name}"')
 
     def get_msg_from_worker(self, timeout: float | None = None) -> Any:
-        deadline: float | None = None
-        if timeout is not None and timeout > 0:
-            deadline = time.time() + timeout
-
-        while deadline is None or time.time() < deadline:
-            try:
-                msg = self._parent_queue.get(block=True, timeout=DEFAULT_POLL_TIMEOUT)
-                break
-            except Empty as error:
-                if not self._conns_pair_closed_by_worker.is_set():
-                    continue
-                raise ValueError(
-                    "Workers has already finished (but maybe alive yet) and it didn't send messages. \
-Most likely it done job."
-                ) from error
-        else:
-            raise TimeoutError("No messages")
+        # closing of conns pair puts "finished" message, so waiting is not polled
+        try:
+            msg = self._parent_queue.get(block=True, timeout=timeout if timeout is not None and timeout > 0 else None)
+        except Empty as error:
+            raise TimeoutError("No messages") from error
 
         if not isinstance(msg, Message):
             raise RuntimeError("Unknown msg is received")  # noqa: TRY004
@@ -281,6 +321,14 @@ Most likely it done job."
 
         return msg.args
 
+    def set_msgs_notifications(self, notifications: Queue) -> None:
+        # the worker is put to the notifications queue every time when messages from it are received
+        self._not_pickable.set("_msgs_notifications", notifications)
+
+    def has_msgs(self) -> bool:
+        # closing by worker is reported by get_msg_from_worker so it is "message" too
+        return not self._parent_queue.empty() or self._conns_pair_closed_by_worker.is_set()
+
     def send_to_worker(self, obj: Any) -> None:
         self._parent_conn.send(Message("other", obj))
 
@@ -298,24 +346,38 @@ Most likely it done job."
         return msg.args
 
     def start(self) -> None:
+        self._spawn()
+        self._await_started()
+
+    def _spawn(self) -> None:
         super().start()
 
         self._start_shifter_if_necessary()
 
         assert _shifter  # noqa: S101
-        _shifter.add(self._parent_conn, self._parent_queue, closed_event=self._conns_pair_closed_by_worker)
-
-        msg: Any = None
-        while msg is None:
-            try:
-                msg = self._parent_queue.get(block=True, timeout=DEFAULT_POLL_TIMEOUT)
-            except Empty as error:  # noqa: PERF203
-                if self._conns_pair_closed_by_worker.is_set():
-                    raise RuntimeError('No "started" msg received') from error
+        notifications = self._msgs_notifications
+        _shifter.add(
+            self._parent_conn,
+            self._parent_queue,
+            closed_event=self._conns_pair_closed_by_worker,
+            on_msgs_received=None if notifications is None else lambda: notifications.put(self),
+        )
 
+    def _await_started(self) -> None:
+        msg = self._parent_queue.get(block=True)
+        if isinstance(msg, Message) and msg.type == "finished":
+            raise RuntimeError('No "started" msg received')
         if not isinstance(msg, Message) or msg.type != "started":
             raise RuntimeError('Not "started" msg is received')
 
+    def _pin_to_cpu(self, worker_idx: int) -> None:
+        # workers keep their data hot in caches of one core rather than migrating between cores
+        if not hasattr(os, "sched_setaffinity"):
+            return
+        cpus = sorted(os.sched_getaffinity(0))
+        with contextlib.suppress(OSError):
+            os.sched_setaffinity(0, {cpus[worker_idx % len(cpus)]})
+
     @abstractmethod
     def _target_to_run(self) -> Any:
         raise NotImplementedError
@@ -323,6 +385,8 @@ Most likely it done job."
     def run(self) -> None:
         try:
             self._worker_conn.send(Message("started", None))
+            if self.cpu_idx is not None:
+                self._pin_to_cpu(self.cpu_idx)
             self._target_to_run()
         finally:
             self._worker_conn.send(Message("finished", None))
@@ -349,13 +413,38 @@ class WorkersManager:
         self.join_timeout_after_termination = join_timeout_after_termination
         self.logger = logger
 
+        self._msgs_notifications: Queue[Worker] = Queue()
+        for worker in self.workers:
+            worker.set_msgs_notifications(self._msgs_notifications)
+
     def open(self) -> None:
         if self.opened or self.closed:
             raise ValueError("Invalid state")
+        # all workers are started at once and then waited so their startups overlap
+        for worker in self.workers:
+            worker._spawn()  # noqa: SLF001
         for worker in self.workers:
-            worker.start()
+            worker._await_started()  # noqa: SLF001
         self.opened = True
 
+    def gather_msgs_from_workers(self, workers: list[Worker] | None = None) -> Iterator[tuple[Worker, Any]]:
+        # yields one message from every worker in order of arriving rather than in order of workers
+        pending = set(self.workers if workers is None else workers)
+
+        # messages that arrived before gathering may have no unread notifications
+        for worker in list(pending):
+            if worker.has_msgs():
+                pending.remove(worker)
+                yield worker, worker.get_msg_from_worker()
+
+        while pending:
+            worker = self._msgs_notifications.get()
+            # notification may be stale because its message is already read
+            if worker not in pending or not worker.has_msgs():
+                continue
+            pending.remove(worker)
+            yield worker, worker.get_msg_from_worker()
+
     def close(self, finishing_timeout: float | None = 0) -> None:
         if not self.opened or self.closed:
             raise ValueError("Invalid state")
@@ -411,42 +500,41 @@ class TemporaryDirectory(OriginalTemporaryDirectory):
 
 
 # Solution objects doesn't support weak refs
-class ModelWrapper:
-    def __init__(self, model: Solution) -> None:
-        self.model = model
+# parsed models are kept for the whole process life rather than weakly because callers hold only models themselves
+MODELS_CACHE_SIZE = 16
+
+
+@functools.cache
+def _get_cantera_datafiles_names() -> frozenset[str]:
+    # data files of cantera do not change while running, so they are listed once
+    return frozenset(Path(path).name for path in ct.list_data_files())
 
 
-_models_cache = weakref.WeakValueDictionary[str, ModelWrapper]()
+@functools.lru_cache(maxsize=MODELS_CACHE_SIZE)
+def _load_model_by_key(key: str) -> Solution:
+    try:
+        return Solution(key)
+    except ct.CanteraError as error:
+        raise ValueError(f"Failed to load model: `{key}`") from error
 
 
 def load_model(model_path: PathLike) -> Solution:
     if isinstance(model_path, str):
         model_path = Path(model_path)
 
-    cantera_datafiles = [Path(path) for path in ct.list_data_files()]
     try:
-        if not any(str(model_path) == datafile.name for datafile in cantera_datafiles):
+        if str(model_path) not in _get_cantera_datafiles_names():
             model_path = model_path.resolve()
     except OSError as error:
         raise ValueError(f"Failed to load model: `{model_path}`") from error
 
-    key = str(model_path)
-
-    model_wrapper = _models_cache.get(key)
-    if model_wrapper is not None:
-        return model_wrapper.model
-
-    try:
-        model = Solution(key)
-    except ct.CanteraError as error:
-        raise ValueError(f"Failed to load model: `{model_path}`") from error
-
-    _models_cache[key] = ModelWrapper(model)
-    return model
+    return _load_model_by_key(str(model_path))
 
 
 def get_species_indexes(species: list[str], model: Solution) -> NDArray[np.uintp]:
-    species_indexes = np.empty((len(species)), dtype=np.uintp)
-    for i, source in enumerate(species):
-        species_indexes[i] = model.species_index(source)
-    return species_indexes
+    # names are looked up in one dict instead of calling cantera for every specy
+    names_to_idxs = {name: idx for idx, name in enumerate(model.species_names)}
+    unknown_species = [specy for specy in species if specy not in names_to_idxs]
+    if unknown_species:
+        raise ValueError(f"Unknown species: {', '.join(unknown_species)}")
+    return np.fromiter((names_to_idxs[specy] for specy in species), dtype=np.uintp, count=len(species))
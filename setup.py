@@ -1,9 +1,13 @@
 # ruff: noqa: T201, T203
 
+import functools
+import hashlib
 import os
 import platform
-import re
+import shutil
 import subprocess
+import sys
+from email.utils import getaddresses
 from pathlib import Path
 from pprint import pprint
 from typing import Any, Literal, TypeAlias, cast
@@ -14,36 +18,91 @@ from setuptools.command.build_ext import build_ext  # type: ignore[import-untype
 PathLike: TypeAlias = str | Path
 
 
+@functools.cache
+def check_cmake() -> None:
+    # cmake is probed once per process however many times extensions are built
+    try:
+        subprocess.check_output(["cmake", "--version"])  # noqa: S607, S603
+    except OSError as error:
+        raise RuntimeError("Cannot find CMake executable") from error
+
+
+def get_build_jobs_count() -> int:
+    # user's CMAKE_BUILD_PARALLEL_LEVEL or cpus available to process, container may have fewer of them than host
+    try:
+        jobs_count = int(os.environ.get("CMAKE_BUILD_PARALLEL_LEVEL") or 0)
+    except ValueError:
+        # not a number is ignored rather than failing the build
+        jobs_count = 0
+    if jobs_count > 0:
+        return jobs_count
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
 class CMakeExtension(Extension):
     def __init__(
-        self, name: str, cmake_lists_dir: PathLike = ".", sources: list[PathLike] | None = None, **kwargs: Any
+        self,
+        name: str,
+        cmake_lists_dir: PathLike = ".",
+        sources: list[PathLike] | None = None,
+        cmake_target: str | None = None,
+        **kwargs: Any,
     ):
         if sources is None:
             sources = []
-        sources = [str(source) for source in sources]
+        sources = [os.fspath(source) for source in sources]
         super().__init__(name, sources=sources, **kwargs)
         self.cmake_lists_dir = os.path.abspath(cmake_lists_dir)
+        # only this target is built if it's set, otherwise all targets including docs
+        self.cmake_target = cmake_target
 
 
 class CMakeBuilder(build_ext):
     def _patch_stupid_cmake(self) -> None:
         path = Path(self.build_temp) / "docs/CMakeFiles/sphinx.dir/build.make"
-        with open(path, "rt") as file:
-            file_content = file.read()
-        lines = file_content.splitlines()
-        problem_line1 = lines.pop(74)
-        problem_line2 = lines.pop(74)
-        fixed_line = problem_line1 + " " + problem_line2.strip()
-        lines.insert(74, fixed_line)
-        file_content = "\n".join(lines)
-        with open(path, "wt") as file:
-            file.write(file_content)
-
-    def build_extensions(self):
-        try:
-            subprocess.check_output(["cmake", "--version"])  # noqa: S607, S603
-        except OSError as error:
-            raise RuntimeError("Cannot find CMake executable") from error
+        tmp_path = path.with_suffix(".make.tmp")
+        # command broken by cmake into 74th and 75th lines is joined back while file is copied
+        with open(path, "rt") as file, open(tmp_path, "wt") as tmp_file:
+            for line_idx, line in enumerate(file):
+                if line_idx == 74:
+                    line = line.rstrip("\n") + " " + next(file).lstrip()
+                tmp_file.write(line)
+        os.replace(tmp_path, path)
+
+    @property
+    def _cmake_verbose(self) -> bool:
+        # distutils is verbose by default so only -v or DISTUTILS_DEBUG make cmake output shown
+        return self.verbose > 1 or bool(os.environ.get("DISTUTILS_DEBUG"))
+
+    def _print_banner(self, title: str) -> None:
+        if self._cmake_verbose:
+            print(f"\n{'=' * len(title)}\n{title}\n{'=' * len(title)}\n")
+
+    def _run_cmake(self, args: list[str]) -> None:
+        if self._cmake_verbose:
+            subprocess.check_call(["cmake", *args], cwd=self.build_temp)  # noqa: S603, S607
+            return
+
+        # output is written to log and shown only if cmake fails
+        with open(Path(self.build_temp) / "cmake.log", "a+t") as log_file:
+            log_start = log_file.tell()
+            try:
+                subprocess.run(  # noqa: S603
+                    ["cmake", *args],  # noqa: S607
+                    cwd=self.build_temp,
+                    check=True,
+                    stdout=log_file,
+                    stderr=subprocess.STDOUT,
+                )
+            except subprocess.CalledProcessError:
+                log_file.seek(log_start)
+                print(log_file.read())
+                raise
+
+    def build_extensions(self):  # noqa: C901
+        check_cmake()
 
         for ext in self.extensions:
             extdir = os.path.abspath(os.path.dirname(self.get_ext_fullpath(ext_name=ext.name)))
@@ -60,68 +119,121 @@ class CMakeBuilder(build_ext):
                 f"-DLIBRARY_OUTPUT_NAME={library_output_name}",
             ]
 
+            # ninja is faster than make and builds in parallel by itself. Generator chosen by user is kept
+            use_ninja = "CMAKE_GENERATOR" not in os.environ and shutil.which("ninja") is not None
+            if use_ninja:
+                cmake_args += ["-G", "Ninja"]
+
+            # unchanged sources are taken from compiler cache rather than compiled again
+            launcher = shutil.which("ccache") or shutil.which("sccache")
+            if launcher is not None:
+                cmake_args += [
+                    f"-DCMAKE_C_COMPILER_LAUNCHER={launcher}",
+                    f"-DCMAKE_CXX_COMPILER_LAUNCHER={launcher}",
+                ]
+
             if platform.system() == "Windows":
                 plat = "x64" if platform.architecture()[0] == "64bit" else "Win32"
                 cmake_args += [
                     "-DCMAKE_WINDOWS_EXPORT_ALL_SYMBOLS=TRUE",
                     f"-DCMAKE_RUNTIME_OUTPUT_DIRECTORY_{cfg.upper()}={extdir}",
                 ]
-                if self.compiler.compiler_type == "msvc":
+                # ninja takes target platform from environment of compiler. Generator chosen by user isn't overridden
+                if not use_ninja and self.compiler.compiler_type == "msvc":
                     cmake_args += [
                         "-DCMAKE_GENERATOR_PLATFORM=%s" % plat,
                     ]
-                else:
+                elif not use_ninja and "CMAKE_GENERATOR" not in os.environ:
                     cmake_args += [
                         "-G",
                         "MinGW Makefiles",
                     ]
 
-            print(f"\n{'='*10}\nCmake args\n{'='*10}\n")
-            pprint(cmake_args)
+            self._print_banner("Cmake args")
+            if self._cmake_verbose:
+                pprint(cmake_args)
 
             if not os.path.exists(self.build_temp):
                 os.makedirs(self.build_temp)
 
-            # Config and build the extension
-            print(f"\n{'='*15}\nConfigure cmake\n{'='*15}\n")
-            subprocess.check_call(["cmake", ext.cmake_lists_dir] + cmake_args, cwd=self.build_temp)  # noqa: S603
-            self._patch_stupid_cmake()
-            print(f"\n{'='*9}\nRun cmake\n{'='*9}\n")
-            subprocess.check_call(["cmake", "--build", ".", "--config", cfg], cwd=self.build_temp)  # noqa: S603, S607
-            print(f"\n{'='*21}\nEnd of cmake building\n{'='*21}\n")
+            # Config and build the extension. Configuring is skipped if build dir is configured with same args
+            args_hash = hashlib.sha256(
+                repr([ext.cmake_lists_dir, os.environ.get("CMAKE_GENERATOR"), *cmake_args]).encode()
+            ).hexdigest()
+            args_hash_path = Path(self.build_temp) / ".hkreduce_cmake_args.sha256"
+            if (
+                (Path(self.build_temp) / "CMakeCache.txt").exists()
+                and args_hash_path.exists()
+                and args_hash_path.read_text() == args_hash
+            ):
+                self._print_banner("Cmake is already configured")
+            else:
+                self._print_banner("Configure cmake")
+                args_hash_path.unlink(missing_ok=True)
+                # cache of other args may hold other generator which cmake refuses to change, so it's configured anew
+                (Path(self.build_temp) / "CMakeCache.txt").unlink(missing_ok=True)
+                shutil.rmtree(Path(self.build_temp) / "CMakeFiles", ignore_errors=True)
+                self._run_cmake([ext.cmake_lists_dir, *cmake_args])
+                if not use_ninja:
+                    # ninja doesn't break long commands so only makefiles need patching
+                    self._patch_stupid_cmake()
+                args_hash_path.write_text(args_hash)
+            self._print_banner("Run cmake")
+            build_args = ["--build", ".", "--config", cfg, "--parallel", str(get_build_jobs_count())]
+            if ext.cmake_target is not None:
+                build_args += ["--target", ext.cmake_target]
+            self._run_cmake(build_args)
+            self._print_banner("End of cmake building")
 
 
 PROJECT_DIR = Path(__file__).parent
 CPP_SOURCE = PROJECT_DIR / "hkreduce/cpp_interface.cpp"
 
-EXT_MODULES = [CMakeExtension(name="hkreduce.cpp_interface", cmake_lists_dir=PROJECT_DIR, sources=[CPP_SOURCE])]
+EXT_MODULES = [
+    CMakeExtension(
+        name="hkreduce.cpp_interface",
+        cmake_lists_dir=PROJECT_DIR,
+        sources=[CPP_SOURCE],
+        cmake_target="hkreduce_cpp_interface",
+    )
+]
 
 
 class SetuptoolsUsage:
-    def __init__(self) -> None:
-        self.parsed_pyproject = self._read_pyproject_toml()
-        self.conf = self.parsed_pyproject["tool"]["poetry"]
+    # pyproject is read on first access rather than on creation
+    @functools.cached_property
+    def parsed_pyproject(self) -> dict[str, Any]:
+        return self._read_pyproject_toml()
+
+    @functools.cached_property
+    def conf(self) -> dict[str, Any]:
+        return self.parsed_pyproject["tool"]["poetry"]
 
     @classmethod
     def _read_pyproject_toml(cls) -> dict[str, Any]:
-        import tomli
+        # tomli is a backport of tomllib for python below 3.11
+        if sys.version_info >= (3, 11):
+            import tomllib
+        else:
+            import tomli as tomllib
 
         with open(PROJECT_DIR / "pyproject.toml", "rb") as pyproject_file:
-            return tomli.load(pyproject_file)
+            return tomllib.load(pyproject_file)
 
     def _split_nicknames_and_emails(self, who: Literal["authors", "maintainers"]) -> tuple[str, str]:
-        pattern = re.compile(r"(?P<nickname>.+)\s+\<(?P<email>.+)\>", flags=re.IGNORECASE)
         nicknames: list[str] = []
         emails: list[str] = []
         source = self.conf.get("maintainers") if who == "maintainers" else self.conf.get("authors")
         if source is None:
             raise ValueError(f"No information about {who}")
         for author_or_maintainer in source:
-            match = pattern.search(author_or_maintainer)
-            if match is None:
+            # "nickname <email>" is address of RFC 2822. Nickname with comma must be quoted else it's two addresses
+            addresses = getaddresses([author_or_maintainer])
+            if len(addresses) != 1 or not all(addresses[0]):
                 raise ValueError(f"String `{author_or_maintainer}` can't be parsed")
-            nicknames.append(match.group("nickname"))
-            emails.append(match.group("email"))
+            nickname, email = addresses[0]
+            nicknames.append(nickname)
+            emails.append(email)
         return ", ".join(nicknames), ", ".join(emails)
 
     def _parse_packages(self) -> tuple[list[str], dict[str, str]]:
@@ -159,14 +271,13 @@ class SetuptoolsUsage:
 
     def _get_dependencies(self) -> list[str]:
         # TODO: implement support of git's dependencies
-        dependencies: list[str] = []
-        for name, version_spec in self.conf["dependencies"].items():
-            if name == "python":
-                continue
-            if version_spec.startswith("^"):
-                version_spec = self._convert_version_spec(version_spec)
-            dependencies.append(f"{name}{version_spec}")
-        return dependencies
+        # not caret specs are returned by _convert_version_spec as is
+        convert_version_spec = self._convert_version_spec
+        return [
+            f"{name}{convert_version_spec(version_spec)}"
+            for name, version_spec in self.conf["dependencies"].items()
+            if name != "python"
+        ]
 
     def __call__(self) -> None:
         authors, authors_emails = self._split_nicknames_and_emails("authors")